@@ -0,0 +1,133 @@
+import gc
+import sys
+import time
+import tracemalloc
+from typing import List
+
+import typer
+from loguru import logger
+from pyftg.models.attack_data import AttackData
+from pyftg.models.character_data import CharacterData
+from pyftg.models.enums.action import Action
+from pyftg.models.enums.state import State
+from pyftg.models.frame_data import FrameData
+from pyftg.models.hit_area import HitArea
+from typing_extensions import Annotated
+
+from src.config import STAGE_HEIGHT
+from src.core import SampleSoundGenAI
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+def build_character(player: bool, frame_number: int) -> CharacterData:
+    # Both characters pace across the stage, and player 1 keeps one projectile in flight
+    phase = frame_number % 240
+    direction = 1 if phase < 120 else -1
+    x = (200 if player else 760) + direction * (phase % 120) - 60
+    projectile_attack = [AttackData(), AttackData(), AttackData()]
+    action = Action.FORWARD_WALK
+    if player and frame_number % 120 >= 60:
+        action = Action.STAND_D_DF_FA
+        left = x + (frame_number % 120 - 60) * 8
+        projectile_attack[0] = AttackData(
+            current_hit_area=HitArea(left=left, right=left + 40, top=500, bottom=540),
+            player_number=player, is_projectile=True, empty_flag=False,
+            identifier=f"projectile-{frame_number // 120}")
+    return CharacterData(
+        player_number=player, hp=400, energy=0, x=x, y=STAGE_HEIGHT - 100,
+        left=x - 20, right=x + 20, top=STAGE_HEIGHT - 200, bottom=STAGE_HEIGHT,
+        speed_x=direction * 2, state=State.STAND, action=action, front=player,
+        projectile_attack=projectile_attack)
+
+
+def build_frames(count: int) -> List[FrameData]:
+    return [FrameData(character_data=[build_character(True, i), build_character(False, i)],
+                      current_frame_number=i, current_round=1, empty_flag=False, front=[True, False])
+            for i in range(1, count + 1)]
+
+
+@app.command()
+def main(
+        frames: Annotated[int, typer.Option(help="Number of measured frames")] = 3600,
+        warmup: Annotated[int, typer.Option(help="Frames run before measuring")] = 600,
+        log: Annotated[bool, typer.Option(help="Keep loguru output enabled while measuring")] = False):
+    if not log:
+        logger.remove()
+    sound_genai = SampleSoundGenAI(enable_audio_output=False)
+    frame_data = build_frames(warmup + frames)
+
+    gc_pauses = {0: [], 1: [], 2: []}
+    # Pause start and collections so far, a frame with a collection in it has no meaningful object count
+    gc_start = [0.0, 0]
+
+    def on_gc(phase: str, info: dict) -> None:
+        if phase == "start":
+            gc_start[0] = time.perf_counter()
+        else:
+            gc_pauses[info["generation"]].append(time.perf_counter() - gc_start[0])
+        gc_start[1] += 1
+
+    for fd in frame_data[:warmup]:
+        sound_genai.get_information(fd)
+        sound_genai.processing()
+        sound_genai.audio_sample()
+
+    gc.callbacks.append(on_gc)
+    tracemalloc.start()
+    start_snapshot = tracemalloc.take_snapshot()
+    processing_transient = []
+    audio_sample_transient = []
+    # GC-tracked objects a frame leaves behind, each one brings the next collection closer
+    retained_objects = []
+    for fd in frame_data[warmup:]:
+        collections = gc_start[1]
+        objects = gc.get_count()[0]
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        sound_genai.get_information(fd)
+        sound_genai.processing()
+        _, peak = tracemalloc.get_traced_memory()
+        processing_transient.append(peak - base)
+
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        audio_sample = sound_genai.audio_sample()
+        _, peak = tracemalloc.get_traced_memory()
+        # The outgoing payload is owned by the gateway, anything beyond it is a per-frame allocation
+        audio_sample_transient.append(peak - base - sys.getsizeof(audio_sample))
+        del audio_sample
+        if gc_start[1] == collections:
+            retained_objects.append(gc.get_count()[0] - objects)
+    end_snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    gc.callbacks.remove(on_gc)
+
+    src_filter = [tracemalloc.Filter(True, "*/src/*")]
+    retained = end_snapshot.filter_traces(src_filter).compare_to(start_snapshot.filter_traces(src_filter), "lineno")
+    retained = [stat for stat in retained if stat.size_diff > 0]
+
+    print(f"Frames measured:         {frames}")
+    for stage, transient in (("processing", processing_transient), ("audio_sample", audio_sample_transient)):
+        transient.sort()
+        print(f"{stage} transient bytes/frame: p50={transient[len(transient) // 2]} max={transient[-1]} "
+              f"frames with allocations={sum(1 for size in transient if size > 0)}")
+    print(f"Retained growth in src/: {sum(stat.size_diff for stat in retained)} bytes")
+    for stat in retained[:10]:
+        print(f"    {stat}")
+    for generation, pauses in gc_pauses.items():
+        worst = max(pauses) * 1000 if pauses else 0.0
+        print(f"GC gen{generation}: {len(pauses)} collections, worst pause {worst:.3f} ms")
+    # Transient bytes include the argument conversion of every ctypes call into OpenAL, which no buffer reuse on this
+    # side avoids. What has to stay at zero is what a frame keeps: starting a sound may create a voice, nothing else may
+    retained_objects.sort()
+    steady = retained_objects[len(retained_objects) * 99 // 100]
+    print(f"Retained GC objects/frame: p99={steady} max={retained_objects[-1]} "
+          f"frames retaining objects={sum(1 for count in retained_objects if count > 0)}")
+    if steady != 0:
+        print("Steady-state frames allocate: expected no retained GC objects in 99% of frames")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,233 @@
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import typer
+from loguru import logger
+from pyftg.models.attack_data import AttackData
+from pyftg.models.character_data import CharacterData
+from pyftg.models.enums.action import Action
+from pyftg.models.enums.state import State
+from pyftg.models.frame_data import FrameData
+from pyftg.models.hit_area import HitArea
+from typing_extensions import Annotated, Optional
+
+from benchmarks.common import StubSoundManager
+from src.character_audio_handler import CharacterAudioHandler
+from src.config import STAGE_HEIGHT, STAGE_WIDTH
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+MAX_PROJECTILES = 20
+
+
+def make_projectile(player: bool, index: int, x: int) -> AttackData:
+    return AttackData(current_hit_area=HitArea(left=x, right=x + 40, top=500, bottom=540), player_number=player,
+                      attack_type=2, is_projectile=True, empty_flag=False, identifier=f"projectile-{index}")
+
+
+def make_character(player: bool = True, x: int = 300, hp: int = 400, energy: int = 0, action: Action = Action.NEUTRAL,
+                   state: State = State.STAND, speed_x: int = 0, bottom: int = STAGE_HEIGHT,
+                   projectiles: List[AttackData] = None) -> CharacterData:
+    return CharacterData(player_number=player, hp=hp, energy=energy, x=x, y=bottom - 100, left=max(x - 20, 0),
+                         right=min(x + 20, STAGE_WIDTH), top=bottom - 200, bottom=bottom, speed_x=speed_x,
+                         state=state, action=action, projectile_attack=projectiles or [AttackData()] * 3)
+
+
+def run_action_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    # Alternating actions defeat the repeat guards, so every call plays a sound
+    actions = [Action.STAND_A, Action.FORWARD_WALK, Action.CROUCH, Action.STAND_B, Action.DASH, Action.STAND]
+    handler.character = make_character()
+    return lambda i: handler.run_action(actions[i % len(actions)])
+
+
+def run_action_projectile_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    # Every call spawns a fresh projectile source that has to be found among MAX_PROJECTILES live ones
+    characters = [make_character(action=Action.STAND_D_DF_FA,
+                                 projectiles=[make_projectile(True, i * MAX_PROJECTILES + k, 100 + k * 30)
+                                              for k in range(MAX_PROJECTILES)])
+                  for i in range(64)]
+
+    def call(i: int) -> None:
+        handler.character = characters[i % len(characters)]
+        handler.temp3 = ' '
+        handler.run_action(Action.STAND_D_DF_FA)
+        if len(handler.source_projectiles_by_id) > MAX_PROJECTILES:
+            handler.reset()
+    return call
+
+
+def hit_attack_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    opponent = CharacterAudioHandler(handler.sound_manager, not handler.player)
+    opponent.character = make_character(player=not handler.player)
+    attacks = [AttackData(attack_type=1), AttackData(attack_type=2, down_prop=True), AttackData(attack_type=3),
+               AttackData(attack_type=4)]
+    characters = [make_character(action=Action.STAND_GUARD), make_character(action=Action.STAND),
+                  make_character(action=Action.CROUCH_GUARD, state=State.CROUCH)]
+    handler.opp_character = opponent.character
+
+    def call(i: int) -> None:
+        handler.character = characters[i % len(characters)]
+        handler.hit_attack(attacks[i % len(attacks)], opponent)
+    return call
+
+
+def update_projectile_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    # MAX_PROJECTILES live sources that move every call, half of them disappear and come back every other call
+    moving = [make_character(projectiles=[make_projectile(True, k, 100 + k * 30 + step) for k in range(MAX_PROJECTILES)])
+              for step in range(2)]
+    thinned = make_character(projectiles=[make_projectile(True, k, 100 + k * 30) for k in range(0, MAX_PROJECTILES, 2)])
+
+    def refill() -> None:
+        for proj in moving[0].projectile_attack:
+            if proj.identifier not in handler.source_projectiles_by_id:
+                handler.current_projectiles[proj.identifier] = proj
+                handler.source_projectiles_by_id[proj.identifier] = handler.sound_manager.create_audio_source()
+
+    def call(i: int) -> None:
+        if i % 4 == 3:
+            handler.character = thinned
+        else:
+            refill()
+            handler.character = moving[i % 2]
+        handler.update_projectile()
+    return call
+
+
+def heart_beat_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    characters = [make_character(hp=hp) for hp in (49, 50, 199, 200)]
+    handler.opp_character = make_character(player=False)
+
+    def call(i: int) -> None:
+        handler.character = characters[i % len(characters)]
+        handler.check_heart_beat()
+    return call
+
+
+def border_alert_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    characters = [make_character(x=20, speed_x=-4), make_character(x=STAGE_WIDTH - 20, speed_x=4)]
+    handler.opp_character = make_character(player=False)
+
+    def call(i: int) -> None:
+        handler.character = characters[i % 2]
+        handler.check_border_alert()
+    return call
+
+
+def enemy_side_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    handler.character = make_character(x=480)
+    opponents = [make_character(player=False, x=200), make_character(player=False, x=760)]
+
+    def call(i: int) -> None:
+        handler.opp_character = opponents[i % 2]
+        handler.update_enemy_side_audio()
+    return call
+
+
+def landing_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    characters = [make_character(bottom=STAGE_HEIGHT), make_character(bottom=STAGE_HEIGHT - 100, state=State.AIR)]
+
+    def call(i: int) -> None:
+        handler.character = characters[i % 2]
+        handler.check_landing()
+    return call
+
+
+def energy_charge_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    character = make_character(energy=100)
+
+    def call(i: int) -> None:
+        handler.character = character
+        handler.pre_energy = 0
+        handler.check_energy_charge()
+    return call
+
+
+def timer_alert_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    handler.character = make_character()
+
+    def call(i: int) -> None:
+        handler.current_frame_number = 3400
+        handler.timer_alert_played = False
+        handler.check_timer_alert()
+    return call
+
+
+def update_case(handler: CharacterAudioHandler) -> Callable[[int], None]:
+    # Whole per-frame update with every check firing: side swaps, HP around thresholds, walking at the border
+    frames = []
+    for i in range(8):
+        projectiles = [make_projectile(True, k, 100 + k * 30 + i) for k in range(MAX_PROJECTILES)]
+        character = make_character(x=20 if i % 2 else STAGE_WIDTH - 20, hp=(49, 50, 199, 200)[i % 4],
+                                   energy=(i + 1) * 60, action=(Action.FORWARD_WALK, Action.STAND_A)[i % 2],
+                                   speed_x=-4 if i % 2 else 4, bottom=STAGE_HEIGHT - 100 * (i % 2),
+                                   projectiles=projectiles)
+        opponent = make_character(player=False, x=STAGE_WIDTH - 20 if i % 2 else 20)
+        frames.append(FrameData(character_data=[character, opponent], current_frame_number=3300 + i, empty_flag=False))
+
+    def call(i: int) -> None:
+        if i % len(frames) == 0:
+            handler.pre_energy = 0
+        handler.update(frames[i % len(frames)])
+    return call
+
+
+CASES: Dict[str, Callable[[CharacterAudioHandler], Callable[[int], None]]] = {
+    "run_action": run_action_case,
+    "run_action[projectile]": run_action_projectile_case,
+    "hit_attack": hit_attack_case,
+    "update_projectile": update_projectile_case,
+    "check_heart_beat": heart_beat_case,
+    "check_border_alert": border_alert_case,
+    "update_enemy_side_audio": enemy_side_case,
+    "check_landing": landing_case,
+    "check_energy_charge": energy_charge_case,
+    "check_timer_alert": timer_alert_case,
+    "update": update_case,
+}
+
+
+def measure(case: Callable[[CharacterAudioHandler], Callable[[int], None]], iterations: int) -> Tuple[float, float, int]:
+    handler = CharacterAudioHandler(StubSoundManager(), True)
+    call = case(handler)
+    for i in range(min(iterations, 1000)):
+        call(i)
+
+    start = time.perf_counter_ns()
+    for i in range(iterations):
+        call(i)
+    ns_per_call = (time.perf_counter_ns() - start) / iterations
+
+    # A second, shorter pass under tracemalloc so its overhead does not skew the timing
+    samples = min(iterations, 2000)
+    tracemalloc.start()
+    transient = 0
+    worst = 0
+    for i in range(samples):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        call(i)
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - base
+        worst = max(worst, peak - base)
+    tracemalloc.stop()
+    return ns_per_call, transient / samples, worst
+
+
+@app.command()
+def main(
+        iterations: Annotated[int, typer.Option(help="Calls per handler method")] = 20000,
+        case: Annotated[Optional[str], typer.Option(help="Only run cases whose name contains this")] = None,
+        log: Annotated[bool, typer.Option(help="Keep loguru output enabled while measuring")] = False):
+    if not log:
+        logger.remove()
+    print(f"{'case':<28}{'ns/call':>12}{'bytes/call':>14}{'max bytes':>12}")
+    for name, factory in CASES.items():
+        if case and case not in name:
+            continue
+        ns_per_call, mean_bytes, worst_bytes = measure(factory, iterations)
+        print(f"{name:<28}{ns_per_call:>12.0f}{mean_bytes:>14.1f}{worst_bytes:>12}")
+
+
+if __name__ == "__main__":
+    app()
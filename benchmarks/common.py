@@ -0,0 +1,69 @@
+import time
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from src.core import SampleSoundGenAI
+from src.match_recorder import FRAME, GAME_END, ROUND_END, MatchEvent
+
+
+def run_match(sound_genai: SampleSoundGenAI, events: Iterable[MatchEvent]) -> Tuple[np.ndarray, np.ndarray]:
+    # Feeds events the way pyftg's SoundController does and returns the rendered audio and per-frame seconds
+    blocks: List[np.ndarray] = []
+    frame_times: List[float] = []
+    for event, data in events:
+        if event == FRAME:
+            start = time.perf_counter()
+            sound_genai.get_information(data)
+            sound_genai.processing()
+            audio_sample = sound_genai.audio_sample()
+            frame_times.append(time.perf_counter() - start)
+            blocks.append(np.frombuffer(audio_sample, dtype=np.float32))
+        elif event == ROUND_END:
+            sound_genai.round_end(data)
+        elif event == GAME_END:
+            sound_genai.game_end()
+    nchannels = sound_genai.sound_manager.nchannels
+    audio = np.concatenate(blocks).reshape(-1, nchannels) if blocks else np.zeros((0, nchannels), dtype=np.float32)
+    return audio, np.array(frame_times)
+
+
+class StubSoundManager:
+    # Implements the SoundManager calls CharacterAudioHandler makes, without OpenAL
+    def __init__(self) -> None:
+        self.sources = set()
+        self.playing = {}
+        self.commands = 0
+
+    def create_audio_source(self, attrs: dict = {}) -> object:
+        source = object()
+        self.sources.add(source)
+        return source
+
+    def remove_source(self, source: object) -> None:
+        self.sources.discard(source)
+        self.playing.pop(source, None)
+
+    def get_sound_buffer(self, sound_name: str) -> str:
+        return sound_name
+
+    def is_playing(self, source: object) -> bool:
+        return source in self.playing
+
+    def play(self, source: object, buffer: str, x: float, y: float, loop: bool) -> None:
+        self.commands += 1
+        # One-shots finish immediately, so every retrigger check takes its most expensive path
+        if loop:
+            self.playing[source] = buffer
+        else:
+            self.playing.pop(source, None)
+
+    def stop(self, source: object) -> None:
+        self.commands += 1
+        self.playing.pop(source, None)
+
+    def set_source_pos(self, source: object, x: float, y: float) -> None:
+        self.commands += 1
+
+    def set_source_gain(self, source: object, gain: float) -> None:
+        self.commands += 1
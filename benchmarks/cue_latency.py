@@ -0,0 +1,108 @@
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from benchmarks.frame_generator import generate_frames
+from src.audio_metrics import detect_level_onsets
+from src.config import SOUND_DATA_PATH
+from src.core import SampleSoundGenAI
+from src.match_recorder import FRAME, ROUND_END, load_match
+from src.sound_manager import SoundManager
+from src.sound_trace import OP_PLAY, SoundTrace, load_trace, replay_trace
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+def record_trace(match: Optional[Path], seed: int, rounds: int) -> SoundTrace:
+    # Plays the match through the real handlers with the trace recorder, the trace says which frame issued what
+    events = load_match(match) if match else generate_frames(seed, rounds)
+    sound_genai = SampleSoundGenAI(enable_audio_output=False, enable_sound_trace=True)
+    try:
+        for event, data in events:
+            if event == FRAME:
+                sound_genai.get_information(data)
+                sound_genai.processing()
+                sound_genai.audio_sample()
+            elif event == ROUND_END:
+                sound_genai.round_end(data)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "match.trace"
+            sound_genai.sound_manager.save_trace(path)
+            return load_trace(path)
+    finally:
+        sound_genai.close()
+
+
+def render_isolated(trace: SoundTrace, name: str) -> np.ndarray:
+    # Same commands, but only this sound is ever started, so every onset in the output belongs to it
+    records = [record for record in trace.records
+               if record.op != OP_PLAY or trace.buffer_names[record.buffer] == name]
+    sound_manager = SoundManager(render_size=trace.render_size)
+    sound_manager.initialize(sample_rate=trace.sample_rate)
+    sound_manager.load_sounds(SOUND_DATA_PATH)
+    try:
+        audio = np.empty((trace.block_count * trace.render_size, sound_manager.nchannels), dtype=np.float32)
+        for block, samples in enumerate(replay_trace(trace._replace(records=records), sound_manager)):
+            audio[block * trace.render_size:(block + 1) * trace.render_size] = samples
+        return audio
+    finally:
+        sound_manager.close()
+
+
+def onset_delays(audio: np.ndarray, triggers: np.ndarray, threshold: float, window_size: int, hop_size: int,
+                 max_delay: int) -> np.ndarray:
+    # Delay from each trigger to the first onset at or after it, NaN when nothing starts within max_delay.
+    # A retrigger while the previous play is still sounding has no onset of its own and counts as missed
+    onsets = detect_level_onsets(audio, threshold, window_size, hop_size)
+    padded = np.append(onsets, np.iinfo(np.int64).max)
+    delays = (padded[np.searchsorted(padded, triggers)] - triggers).astype(np.float64)
+    delays[delays > max_delay] = np.nan
+    return delays
+
+
+@app.command()
+def main(
+        trace_path: Annotated[Optional[Path], typer.Argument(help="Sound trace recorded with ENABLE_SOUND_TRACE, "
+                                                                  "recorded from --match or a generated game if omitted")] = None,
+        match: Annotated[Optional[Path], typer.Option(help="Recorded match to trace instead of a generated game")] = None,
+        seed: Annotated[int, typer.Option(help="Seed of the generated game")] = 0,
+        rounds: Annotated[int, typer.Option(help="Rounds of the generated game")] = 1,
+        threshold_db: Annotated[float, typer.Option(help="Level in dBFS at which a cue counts as audible")] = -50.0,
+        window_size: Annotated[int, typer.Option(help="Onset detection window in samples")] = 64,
+        hop_size: Annotated[int, typer.Option(help="Onset detection hop in samples, the resolution of every delay")] = 16,
+        max_delay_ms: Annotated[float, typer.Option(help="Triggers with no onset within this long count as missed")] = 250.0):
+    logger.remove()
+    trace = load_trace(trace_path) if trace_path else record_trace(match, seed, rounds)
+    ms_per_sample = 1000 / trace.sample_rate
+    plays: Dict[str, List[int]] = {}
+    for record in trace.records:
+        if record.op == OP_PLAY:
+            # Measured from the start of the block of the frame that issued the cue, so the asset pre-roll and any
+            # quantization by the renderer are part of the delay
+            plays.setdefault(trace.buffer_names[record.buffer], []).append(record.block * trace.render_size)
+
+    rows = []
+    for name, triggers in plays.items():
+        audio = render_isolated(trace, name)
+        delays = onset_delays(audio, np.array(triggers, dtype=np.int64), 10 ** (threshold_db / 20), window_size,
+                              hop_size, int(max_delay_ms / ms_per_sample)) * ms_per_sample
+        found = delays[~np.isnan(delays)]
+        p50, p95, worst = np.percentile(found, [50, 95, 100]) if len(found) else (np.nan, np.nan, np.nan)
+        rows.append((name, len(triggers), len(found), p50, p95, worst))
+
+    # Worst offenders first
+    rows.sort(key=lambda row: -np.nan_to_num(row[4], nan=np.inf))
+    print(f"{'cue':<24} {'plays':>6} {'found':>6} {'p50':>9} {'p95':>9} {'max':>9}")
+    for name, count, found, p50, p95, worst in rows:
+        print(f"{name:<24} {count:>6} {found:>6} {p50:7.1f}ms {p95:7.1f}ms {worst:7.1f}ms")
+    print(f"{sum(row[1] for row in rows)} cues over {trace.block_count} blocks, delays resolved to "
+          f"{hop_size * ms_per_sample:.2f} ms")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,291 @@
+import random
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import typer
+from pyftg.models.attack_data import AttackData
+from pyftg.models.character_data import CharacterData
+from pyftg.models.enums.action import Action
+from pyftg.models.enums.state import State
+from pyftg.models.frame_data import FrameData
+from pyftg.models.hit_area import HitArea
+from pyftg.models.round_result import RoundResult
+from typing_extensions import Annotated
+
+from src.config import STAGE_HEIGHT, STAGE_WIDTH
+from src.match_recorder import FRAME, GAME_END, ROUND_END, MatchEvent, MatchRecorder
+
+ROUND_FRAMES = 3600
+START_HP = 400
+MAX_ENERGY = 300
+GRAVITY = 1
+JUMP_SPEED = 18
+WALK_SPEED = 4
+DASH_SPEED = 10
+BODY_WIDTH = 40
+BODY_HEIGHT = 200
+PROJECTILE_SLOTS = 3
+
+GROUND_ATTACKS = [Action.STAND_A, Action.STAND_B, Action.STAND_FA, Action.STAND_FB, Action.CROUCH_A,
+                  Action.CROUCH_B, Action.CROUCH_FA, Action.CROUCH_FB, Action.STAND_F_D_DFA, Action.STAND_F_D_DFB,
+                  Action.STAND_D_DB_BA, Action.STAND_D_DB_BB]
+AIR_ATTACKS = [Action.AIR_A, Action.AIR_B, Action.AIR_DA, Action.AIR_DB, Action.AIR_FA, Action.AIR_FB,
+               Action.AIR_UA, Action.AIR_UB, Action.AIR_F_D_DFA, Action.AIR_D_DB_BA]
+GROUND_PROJECTILES = [Action.STAND_D_DF_FA, Action.STAND_D_DF_FB, Action.STAND_D_DF_FC]
+AIR_PROJECTILES = [Action.AIR_D_DF_FA, Action.AIR_D_DF_FB]
+THROWS = [Action.THROW_A, Action.THROW_B]
+
+# Scripted intents a bot picks from, with the relative weight of each
+INTENTS = [("idle", 2), ("forward", 6), ("back", 3), ("dash", 2), ("back_step", 1), ("jump", 3),
+           ("crouch", 2), ("attack", 6), ("projectile", 3), ("throw", 1), ("guard", 3)]
+
+
+class Fighter:
+    def __init__(self, player: bool, x: int) -> None:
+        self.player = player
+        self.x = x
+        self.bottom = STAGE_HEIGHT
+        self.speed_x = 0
+        self.speed_y = 0
+        self.hp = START_HP
+        self.energy = 0
+        self.action = Action.STAND
+        self.state = State.STAND
+        self.front = player
+        self.intent = "idle"
+        self.intent_frames = 0
+        self.busy_frames = 0
+        self.down_frames = 0
+        self.attack: Optional[AttackData] = None
+        self.projectiles: List[AttackData] = []
+
+    @property
+    def left(self) -> int:
+        return self.x - BODY_WIDTH // 2
+
+    @property
+    def right(self) -> int:
+        return self.x + BODY_WIDTH // 2
+
+    @property
+    def top(self) -> int:
+        return self.bottom - (BODY_HEIGHT // 2 if self.state is State.CROUCH else BODY_HEIGHT)
+
+    def overlaps(self, area: HitArea) -> bool:
+        return self.left <= area.right and self.right >= area.left and self.top <= area.bottom and self.bottom >= area.top
+
+    def to_character_data(self) -> CharacterData:
+        projectiles = self.projectiles + [AttackData() for _ in range(max(PROJECTILE_SLOTS - len(self.projectiles), 0))]
+        return CharacterData(
+            player_number=self.player, hp=self.hp, energy=self.energy, x=self.x, y=self.bottom - BODY_HEIGHT // 2,
+            left=self.left, right=self.right, top=self.top, bottom=self.bottom, speed_x=self.speed_x,
+            speed_y=self.speed_y, state=self.state, action=self.action, front=self.front,
+            control=self.busy_frames == 0, attack_data=self.attack or AttackData(),
+            remaining_frame=self.busy_frames, projectile_attack=projectiles)
+
+
+class FrameGenerator:
+    # Minimal two-bot fighting game loop that produces FrameData shaped like DareFightingICE's
+    def __init__(self, seed: int = 0, round_frames: int = ROUND_FRAMES) -> None:
+        self.random = random.Random(seed)
+        self.round_frames = round_frames
+        self.projectile_count = 0
+
+    def make_attack(self, fighter: Fighter, attack_type: int, reach: int, damage: int, down_prop: bool) -> AttackData:
+        direction = 1 if fighter.front else -1
+        near = fighter.x + direction * BODY_WIDTH // 2
+        far = near + direction * reach
+        area = HitArea(left=min(near, far), right=max(near, far), top=fighter.top + 40, bottom=fighter.top + 120)
+        return AttackData(current_hit_area=area, player_number=fighter.player, attack_type=attack_type,
+                          hit_damage=damage, guard_damage=damage // 4, down_prop=down_prop, is_live=True,
+                          empty_flag=False)
+
+    def spawn_projectile(self, fighter: Fighter) -> None:
+        if len(fighter.projectiles) >= PROJECTILE_SLOTS or fighter.energy < 30:
+            return
+        fighter.energy -= 30
+        self.projectile_count += 1
+        projectile = self.make_attack(fighter, 2, 40, 8, False)
+        projectile.is_projectile = True
+        projectile.speed_x = 8 if fighter.front else -8
+        projectile.identifier = f"{'P1' if fighter.player else 'P2'}-{self.projectile_count}"
+        fighter.projectiles.append(projectile)
+
+    def choose_intent(self, fighter: Fighter) -> None:
+        names, weights = zip(*INTENTS)
+        fighter.intent = self.random.choices(names, weights)[0]
+        fighter.intent_frames = self.random.randint(6, 45)
+
+    def act(self, fighter: Fighter) -> None:
+        airborne = fighter.bottom < STAGE_HEIGHT
+        direction = 1 if fighter.front else -1
+        if fighter.down_frames > 0:
+            fighter.down_frames -= 1
+            fighter.action, fighter.state, fighter.speed_x = Action.DOWN, State.DOWN, 0
+            if fighter.down_frames == 0:
+                fighter.action, fighter.state = Action.RISE, State.STAND
+            return
+        if fighter.busy_frames > 0:
+            fighter.busy_frames -= 1
+            if fighter.busy_frames == 0:
+                fighter.attack = None
+            return
+        fighter.intent_frames -= 1
+        if fighter.intent_frames <= 0:
+            self.choose_intent(fighter)
+        if airborne:
+            fighter.state = State.AIR
+            if fighter.intent == "attack" and self.random.random() < 0.2:
+                fighter.action = self.random.choice(AIR_ATTACKS)
+                fighter.attack = self.make_attack(fighter, 1, 60, 6, fighter.action is Action.AIR_DB)
+                fighter.busy_frames = 12
+            elif fighter.intent == "projectile" and self.random.random() < 0.2:
+                fighter.action = self.random.choice(AIR_PROJECTILES)
+                self.spawn_projectile(fighter)
+                fighter.busy_frames = 15
+            elif fighter.intent == "guard":
+                fighter.action = Action.AIR_GUARD
+            else:
+                fighter.action = Action.AIR
+            return
+
+        fighter.state = State.STAND
+        fighter.speed_x = 0
+        if fighter.intent == "forward":
+            fighter.action, fighter.speed_x = Action.FORWARD_WALK, direction * WALK_SPEED
+        elif fighter.intent == "back":
+            fighter.action, fighter.speed_x = Action.FORWARD_WALK, -direction * WALK_SPEED
+        elif fighter.intent == "dash":
+            fighter.action, fighter.speed_x = Action.DASH, direction * DASH_SPEED
+        elif fighter.intent == "back_step":
+            fighter.action, fighter.speed_x = Action.BACK_STEP, -direction * DASH_SPEED
+        elif fighter.intent == "jump":
+            fighter.action = self.random.choice([Action.JUMP, Action.FOR_JUMP, Action.BACK_JUMP])
+            fighter.speed_y = -JUMP_SPEED
+            fighter.speed_x = {Action.JUMP: 0, Action.FOR_JUMP: direction * WALK_SPEED,
+                               Action.BACK_JUMP: -direction * WALK_SPEED}[fighter.action]
+            fighter.state = State.AIR
+            fighter.intent = "attack" if self.random.random() < 0.5 else "idle"
+        elif fighter.intent == "crouch":
+            fighter.action, fighter.state = Action.CROUCH, State.CROUCH
+        elif fighter.intent == "guard":
+            fighter.action = Action.STAND_GUARD
+        elif fighter.intent == "attack":
+            fighter.action = self.random.choice(GROUND_ATTACKS)
+            if fighter.action.name.startswith("CROUCH"):
+                fighter.state = State.CROUCH
+            attack_type = 3 if fighter.state is State.CROUCH else 2
+            fighter.attack = self.make_attack(fighter, attack_type, 70, 8, fighter.action.name.endswith("FB"))
+            fighter.busy_frames = 15
+        elif fighter.intent == "projectile":
+            fighter.action = self.random.choice(GROUND_PROJECTILES)
+            self.spawn_projectile(fighter)
+            fighter.busy_frames = 20
+            fighter.intent_frames = 0
+        elif fighter.intent == "throw":
+            fighter.action = self.random.choice(THROWS)
+            fighter.attack = self.make_attack(fighter, 4, 20, 12, False)
+            fighter.busy_frames = 20
+            fighter.intent_frames = 0
+        else:
+            fighter.action = Action.STAND
+
+    def move(self, fighter: Fighter) -> None:
+        fighter.x = min(max(fighter.x + fighter.speed_x, BODY_WIDTH // 2), STAGE_WIDTH - BODY_WIDTH // 2)
+        if fighter.bottom < STAGE_HEIGHT or fighter.speed_y < 0:
+            fighter.bottom += fighter.speed_y
+            fighter.speed_y += GRAVITY
+            if fighter.bottom >= STAGE_HEIGHT:
+                fighter.bottom, fighter.speed_y = STAGE_HEIGHT, 0
+                fighter.action, fighter.state, fighter.speed_x = Action.LANDING, State.STAND, 0
+        # Moved copies, the frames already yielded keep pointing at the projectiles where they were
+        moved = [replace(p, current_hit_area=replace(p.current_hit_area, left=p.current_hit_area.left + p.speed_x,
+                                                     right=p.current_hit_area.right + p.speed_x),
+                         current_frame=p.current_frame + 1)
+                 for p in fighter.projectiles]
+        fighter.projectiles = [p for p in moved if p.current_hit_area.right > 0 and p.current_hit_area.left < STAGE_WIDTH]
+
+    def resolve_hit(self, attacker: Fighter, defender: Fighter, attack: AttackData) -> bool:
+        if defender.state is State.DOWN or not defender.overlaps(attack.current_hit_area):
+            return False
+        guarding = defender.action in (Action.STAND_GUARD, Action.AIR_GUARD, Action.CROUCH_GUARD)
+        if guarding and attack.attack_type != 4:
+            defender.hp -= attack.guard_damage
+            defender.action = Action.STAND_GUARD_RECOV
+        else:
+            defender.hp -= attack.hit_damage
+            attacker.energy = min(attacker.energy + attack.hit_damage, MAX_ENERGY)
+            if attack.attack_type == 4:
+                attacker.action, defender.action = Action.THROW_HIT, Action.THROW_SUFFER
+            if attack.down_prop:
+                defender.down_frames = 20
+        defender.energy = min(defender.energy + 5, MAX_ENERGY)
+        return True
+
+    def generate_round(self, round_number: int) -> Iterator[MatchEvent]:
+        fighters = [Fighter(True, STAGE_WIDTH // 4), Fighter(False, STAGE_WIDTH * 3 // 4)]
+        for frame_number in range(self.round_frames):
+            fighters[0].front = fighters[0].x <= fighters[1].x
+            fighters[1].front = not fighters[0].front
+            for fighter in fighters:
+                self.act(fighter)
+                self.move(fighter)
+                fighter.energy = min(fighter.energy + 1, MAX_ENERGY)
+            for attacker, defender in ((fighters[0], fighters[1]), (fighters[1], fighters[0])):
+                if attacker.attack and self.resolve_hit(attacker, defender, attacker.attack):
+                    attacker.attack = None
+                attacker.projectiles = [p for p in attacker.projectiles if not self.resolve_hit(attacker, defender, p)]
+            yield FRAME, FrameData(
+                character_data=[fighter.to_character_data() for fighter in fighters],
+                current_frame_number=frame_number, current_round=round_number,
+                projectile_data=fighters[0].projectiles + fighters[1].projectiles, empty_flag=False,
+                front=[fighters[0].front, fighters[1].front])
+            if any(fighter.hp <= 0 for fighter in fighters):
+                break
+        yield ROUND_END, RoundResult(current_round=round_number,
+                                     remaining_hps=[max(fighter.hp, 0) for fighter in fighters],
+                                     elapsed_frame=frame_number + 1)
+
+    def generate_game(self, rounds: int = 3) -> Iterator[MatchEvent]:
+        for round_number in range(1, rounds + 1):
+            yield from self.generate_round(round_number)
+        yield GAME_END, None
+
+
+def generate_frames(seed: int = 0, rounds: int = 3) -> Iterator[MatchEvent]:
+    return FrameGenerator(seed).generate_game(rounds)
+
+
+def frames_only(events: Iterator[MatchEvent]) -> Iterator[FrameData]:
+    for event, data in events:
+        if event == FRAME:
+            yield data
+
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+def write_match(output: Path, seed: int, rounds: int) -> Path:
+    recorder = MatchRecorder(output, f"synthetic-{seed:04d}")
+    for event, data in generate_frames(seed, rounds):
+        if event == FRAME:
+            recorder.record_frame(data)
+        elif event == ROUND_END:
+            recorder.record_round_end(data)
+    return recorder.record_game_end()
+
+
+@app.command()
+def main(
+        output: Annotated[Path, typer.Option(help="Directory the generated matches are written to")] = Path('benchmarks/corpus'),
+        games: Annotated[int, typer.Option(help="Number of games to generate")] = 3,
+        rounds: Annotated[int, typer.Option(help="Rounds per game")] = 3,
+        seed: Annotated[int, typer.Option(help="Seed of the first game, the following games use seed + n")] = 0):
+    # Writes synthetic matches in the same format as ENABLE_MATCH_RECORDING, e.g. as a golden-audio corpus
+    for game in range(games):
+        print(write_match(output, seed + game, rounds))
+
+
+if __name__ == "__main__":
+    app()
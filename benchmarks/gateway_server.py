@@ -0,0 +1,158 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import typer
+from google.protobuf import json_format
+from loguru import logger
+from pyftg.models.enums.flag import Flag
+from pyftg.protoc import service_pb2
+from pyftg.socket.aio.sound_controller import CLOSE, INIT_SOUND_GENAI, PROCESSING
+from pyftg.socket.utils.asyncio import recv_data, send_data
+from typing_extensions import Annotated
+
+from benchmarks.common import run_match
+from benchmarks.frame_generator import MAX_ENERGY, START_HP, generate_frames
+from src.config import SOUND_RENDER_SIZE
+from src.core import SampleSoundGenAI
+from src.match_recorder import FRAME, GAME_END, ROUND_END, MatchEvent, load_match
+
+FRAME_RATE = 60
+PERCENTILES = [50, 95, 99]
+CONNECT_TIMEOUT = 30
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+def game_state(flag: Flag, **fields) -> bytes:
+    state = service_pb2.PlayerGameState(state_flag=flag)
+    for name, value in fields.items():
+        json_format.ParseDict(value, getattr(state, name))
+    return state.SerializeToString()
+
+
+def frame_dict(frame_data) -> dict:
+    frame = frame_data.to_dict()
+    # The game sends no character data at all rather than null entries
+    if any(character is None for character in frame["character_data"]):
+        frame["character_data"] = []
+    return frame
+
+
+def encode_events(events: Iterable[MatchEvent]) -> List[Tuple[bool, bytes]]:
+    # Serializes every state up front so the timed loop only measures the sound AI side of the socket
+    game_data = {"max_hps": [START_HP, START_HP], "max_energies": [MAX_ENERGY, MAX_ENERGY],
+                 "character_names": ["ZEN", "ZEN"], "ai_names": ["FrameGenerator", "FrameGenerator"]}
+    packets = [(False, game_state(Flag.INITIALIZE, game_data=game_data))]
+    round_result = None
+    for event, data in events:
+        if event == FRAME:
+            if round_result is not None:
+                packets.append((False, game_state(Flag.ROUND_END, round_result=round_result)))
+                round_result = None
+            packets.append((True, game_state(Flag.PROCESSING, frame_data=frame_dict(data))))
+        elif event == ROUND_END:
+            round_result = data.to_dict()
+        elif event == GAME_END:
+            # The last round result arrives with GAME_END, SoundController passes it to round_end itself
+            packets.append((False, game_state(Flag.GAME_END, round_result=round_result or {})))
+            round_result = None
+    return packets
+
+
+async def serve(packets: List[Tuple[bool, bytes]], port: int, speed: float,
+                client: Optional[subprocess.Popen]) -> Tuple[np.ndarray, int, float]:
+    connected = asyncio.get_running_loop().create_future()
+
+    async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if not connected.done():
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(on_connect, "127.0.0.1", port)
+    if client is None:
+        print(f"Waiting for a sound AI on port {port}, start it with `python main.py --port {port}`")
+    reader, writer = await asyncio.wait_for(connected, None if client is None else CONNECT_TIMEOUT)
+    if await recv_data(reader, 1) != INIT_SOUND_GENAI:
+        raise RuntimeError("Client is not a sound AI")
+    await recv_data(reader)
+
+    interval = 1 / (FRAME_RATE * speed) if speed > 0 else 0.0
+    round_trips = []
+    audio_bytes = 0
+    start = time.perf_counter()
+    deadline = start
+    for is_frame, packet in packets:
+        if is_frame:
+            now = time.perf_counter()
+            if now < deadline:
+                await asyncio.sleep(deadline - now)
+            deadline = max(deadline + interval, time.perf_counter())
+        sent = time.perf_counter()
+        await send_data(writer, PROCESSING, with_header=False)
+        await send_data(writer, packet)
+        if is_frame:
+            audio_bytes += len(await recv_data(reader))
+            round_trips.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    await send_data(writer, CLOSE, with_header=False)
+    await reader.read()
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return np.array(round_trips), audio_bytes, elapsed
+
+
+@app.command()
+def main(
+        port: Annotated[int, typer.Option(help="Port to listen on")] = 31415,
+        rounds: Annotated[int, typer.Option(help="Number of generated rounds to send")] = 3,
+        seed: Annotated[int, typer.Option(help="Seed of the generated match")] = 0,
+        match: Annotated[Optional[Path], typer.Option(help="Send a recorded match instead of generated rounds")] = None,
+        speed: Annotated[float, typer.Option(help="Multiple of real time (60 fps) to send frames at, 0 = lock-step")] = 0.0,
+        spawn: Annotated[bool, typer.Option(help="Start `main.py` as the client instead of waiting for one")] = True,
+        baseline: Annotated[bool, typer.Option(help="Also time the same frames in-process to isolate socket overhead")] = True):
+    logger.remove()
+    events = list(load_match(match) if match else generate_frames(seed, rounds))
+    packets = encode_events(events)
+
+    client = None
+    if spawn:
+        env = dict(os.environ, SERVER_HOST="127.0.0.1", SERVER_PORT=str(port))
+        # The client still formats its console log, only the output is discarded
+        client = subprocess.Popen([sys.executable, "main.py", "--port", str(port)], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        round_trips, audio_bytes, elapsed = asyncio.run(serve(packets, port, speed, client))
+    finally:
+        if client is not None:
+            client.wait(timeout=CONNECT_TIMEOUT)
+
+    expected_bytes = len(round_trips) * SOUND_RENDER_SIZE * 2 * 4
+    round_trips *= 1e3
+    print(f"Frames:      {len(round_trips)} in {elapsed:.2f} s = {len(round_trips) / elapsed:.0f} fps, "
+          f"{audio_bytes / elapsed / 1e6:.2f} MB/s of audio")
+    if audio_bytes != expected_bytes:
+        print(f"Audio:       received {audio_bytes} bytes, expected {expected_bytes}")
+    print(f"Round trip:  {' / '.join(f'p{p} {np.percentile(round_trips, p):.3f}' for p in PERCENTILES)}"
+          f" / max {round_trips.max():.3f} ms")
+    if baseline:
+        sound_genai = SampleSoundGenAI(enable_audio_output=False)
+        try:
+            _, frame_times = run_match(sound_genai, events)
+        finally:
+            sound_genai.close()
+        frame_times *= 1e3
+        print(f"In-process:  {' / '.join(f'p{p} {np.percentile(frame_times, p):.3f}' for p in PERCENTILES)}"
+              f" / max {frame_times.max():.3f} ms")
+        print(f"Overhead:    {' / '.join(f'p{p} {np.percentile(round_trips, p) - np.percentile(frame_times, p):.3f}' for p in PERCENTILES)} ms "
+              f"(serialization, socket and executor hand-off)")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,157 @@
+import hashlib
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from benchmarks.common import run_match
+from src.audio_metrics import (block_rms, detect_onsets, match_onsets,
+                               spectral_distance)
+from src.config import SOUND_RENDER_SIZE
+from src.core import SampleSoundGenAI
+from src.match_recorder import GAME_END, load_match
+from src.sound_trace import SoundTraceRecorder
+
+CORPUS_PATH = Path('benchmarks/corpus')
+GOLDEN_PATH = Path('benchmarks/golden')
+PERCENTILES = [50, 95, 99]
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+def corpus_matches(corpus: Path) -> List[Path]:
+    matches = sorted(corpus.glob("*.jsonl.gz"))
+    if not matches:
+        # Nothing compared is not a pass
+        print(f"No recorded matches (*.jsonl.gz) in {corpus}")
+        raise typer.Exit(1)
+    return matches
+
+
+def match_name(path: Path) -> str:
+    return path.name.removesuffix(".jsonl.gz")
+
+
+def trace_digest(sound_manager: SoundTraceRecorder) -> str:
+    # The commands the handlers issued, which unlike the mix do not depend on the OpenAL build
+    digest = hashlib.sha256()
+    for name in sound_manager.buffer_names:
+        digest.update(name.encode('utf-8') + b'\0')
+    digest.update(sound_manager.trace)
+    return digest.hexdigest()
+
+
+def render_match(path: Path) -> Tuple[np.ndarray, np.ndarray, str]:
+    sound_genai = SampleSoundGenAI(enable_audio_output=False, enable_sound_trace=True)
+    try:
+        # game_end would save the trace to logs and start a new one
+        events = (event for event in load_match(path) if event[0] != GAME_END)
+        audio, frame_times = run_match(sound_genai, events)
+        digest = trace_digest(sound_genai.sound_manager)
+    finally:
+        sound_genai.close()
+    timings = np.percentile(frame_times, PERCENTILES) if len(frame_times) else np.zeros(len(PERCENTILES))
+    return audio, timings, digest
+
+
+def save_golden(golden: Path, name: str, audio: np.ndarray, timings: np.ndarray) -> None:
+    golden.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(golden / f"{name}.npz", audio=audio, timings=timings)
+
+
+def save_trace_golden(golden: Path, name: str, digest: str) -> None:
+    golden.mkdir(parents=True, exist_ok=True)
+    (golden / f"{name}.trace.sha256").write_text(digest + "\n")
+
+
+@app.command()
+def bless(
+        corpus: Annotated[Path, typer.Option(help="Directory of recorded matches")] = CORPUS_PATH,
+        golden: Annotated[Path, typer.Option(help="Directory the golden renders are written to")] = GOLDEN_PATH,
+        trace: Annotated[bool, typer.Option(
+            help="Rewrite the committed command-trace goldens as well, not only the local renders")] = True):
+    logger.remove()
+    for path in corpus_matches(corpus):
+        name = match_name(path)
+        audio, timings, digest = render_match(path)
+        save_golden(golden, name, audio, timings)
+        if trace:
+            save_trace_golden(golden, name, digest)
+        print(f"{name}: {len(audio)} samples, trace {digest[:12]}, frame time p50/p95/p99 "
+              f"{' / '.join(f'{t * 1e3:.3f}' for t in timings)} ms")
+
+
+@app.command()
+def check(
+        corpus: Annotated[Path, typer.Option(help="Directory of recorded matches")] = CORPUS_PATH,
+        golden: Annotated[Path, typer.Option(help="Directory of golden renders")] = GOLDEN_PATH,
+        rms_tolerance: Annotated[float, typer.Option(help="Max per-block RMS difference")] = 1e-3,
+        spectral_tolerance: Annotated[float, typer.Option(help="Max mean log-spectral distance in dB")] = 1.0,
+        onset_tolerance: Annotated[int, typer.Option(help="Max cue onset shift in samples")] = 256,
+        timing_tolerance: Annotated[float, typer.Option(help="Allowed relative slowdown of frame time percentiles")] = 0.25,
+        check_timing: Annotated[bool, typer.Option(
+            help="Gate on frame time as well, only meaningful on the machine that blessed the goldens")] = False,
+        audio_check: Annotated[bool, typer.Option(
+            "--audio/--no-audio", help="Compare against the local golden renders, not only the committed traces")] = True):
+    logger.remove()
+    failures = 0
+    for path in corpus_matches(corpus):
+        name = match_name(path)
+        audio, timings, digest = render_match(path)
+        problems = []
+        trace_file = golden / f"{name}.trace.sha256"
+        if not trace_file.exists():
+            problems.append(f"no golden trace {trace_file}, run bless")
+        elif trace_file.read_text().strip() != digest:
+            problems.append(f"sound commands differ from the golden trace ({digest[:12]} != "
+                            f"{trace_file.read_text().strip()[:12]})")
+        golden_file = golden / f"{name}.npz"
+        if audio_check and not golden_file.exists():
+            # Renders depend on the OpenAL build and stay out of git, bless --no-trace records them for this machine
+            problems.append(f"no golden render {golden_file}, run bless --no-trace before changing anything")
+        if not audio_check or not golden_file.exists():
+            for problem in problems:
+                print(f"{name}: FAIL {problem}")
+            failures += bool(problems)
+            continue
+        reference = np.load(golden_file)
+
+        if audio.shape != reference["audio"].shape:
+            problems.append(f"length {audio.shape} != golden {reference['audio'].shape}")
+        else:
+            rms_difference = float(np.max(np.abs(block_rms(audio, SOUND_RENDER_SIZE) -
+                                                 block_rms(reference["audio"], SOUND_RENDER_SIZE)), initial=0.0))
+            distance = spectral_distance(audio, reference["audio"])
+            golden_onsets = detect_onsets(reference["audio"])
+            shifts = match_onsets(detect_onsets(audio), golden_onsets, onset_tolerance)
+            missing = int(np.count_nonzero(np.isnan(shifts)))
+            worst_shift = float(np.nanmax(np.abs(shifts))) if len(shifts) > missing else 0.0
+            print(f"{name}: block RMS diff {rms_difference:.2e}, spectral distance {distance:.3f} dB, "
+                  f"onsets {len(golden_onsets) - missing}/{len(golden_onsets)} aligned (worst shift {worst_shift:.0f})")
+            if rms_difference > rms_tolerance:
+                problems.append(f"block RMS difference {rms_difference:.2e} > {rms_tolerance:.2e}")
+            if distance > spectral_tolerance:
+                problems.append(f"spectral distance {distance:.3f} dB > {spectral_tolerance} dB")
+            if missing:
+                problems.append(f"{missing} cue onsets moved by more than {onset_tolerance} samples")
+
+        baseline = reference["timings"]
+        print(f"{name}: frame time p50/p95/p99 {' / '.join(f'{t * 1e3:.3f}' for t in timings)} ms "
+              f"(golden {' / '.join(f'{t * 1e3:.3f}' for t in baseline)} ms)")
+        if check_timing:
+            for percentile, value, limit in zip(PERCENTILES, timings, baseline * (1 + timing_tolerance)):
+                if value > limit:
+                    problems.append(f"p{percentile} frame time {value * 1e3:.3f} ms > {limit * 1e3:.3f} ms")
+
+        for problem in problems:
+            print(f"{name}: FAIL {problem}")
+        failures += bool(problems)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    app()
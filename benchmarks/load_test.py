@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from benchmarks.frame_generator import generate_frames
+from src.core import SampleSoundGenAI
+from src.match_recorder import FRAME, GAME_END, ROUND_END
+
+FRAME_RATE = 60
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+@app.command()
+def main(
+        rounds: Annotated[int, typer.Option(help="Number of generated rounds to play")] = 300,
+        speed: Annotated[float, typer.Option(help="Multiple of real time (60 fps) to push frames at, 0 = unthrottled")] = 10.0,
+        rounds_per_game: Annotated[int, typer.Option(help="Rounds per generated game")] = 3,
+        seed: Annotated[int, typer.Option(help="Seed of the first game, the following games use seed + n")] = 0):
+    logger.remove()
+    sound_genai = SampleSoundGenAI(enable_audio_output=False)
+    interval = 1 / (FRAME_RATE * speed) if speed > 0 else 0.0
+    frame_times = []
+    missed_deadlines = 0
+    played_rounds = 0
+    game = 0
+    start = time.perf_counter()
+    deadline = start
+    while played_rounds < rounds:
+        for event, data in generate_frames(seed + game, min(rounds_per_game, rounds - played_rounds)):
+            if event == FRAME:
+                now = time.perf_counter()
+                if now < deadline:
+                    time.sleep(deadline - now)
+                frame_start = time.perf_counter()
+                sound_genai.get_information(data)
+                sound_genai.processing()
+                sound_genai.audio_sample()
+                frame_end = time.perf_counter()
+                frame_times.append(frame_end - frame_start)
+                deadline += interval
+                if interval and frame_end > deadline:
+                    missed_deadlines += 1
+                    # Do not try to catch up with a burst once a deadline is missed
+                    deadline = frame_end
+            elif event == ROUND_END:
+                sound_genai.round_end(data)
+                played_rounds += 1
+            elif event == GAME_END:
+                sound_genai.game_end()
+        game += 1
+    elapsed = time.perf_counter() - start
+    sound_genai.close()
+
+    frame_times = np.array(frame_times) * 1e3
+    print(f"Rounds:           {played_rounds} ({game} games)")
+    print(f"Frames:           {len(frame_times)} in {elapsed:.1f} s = {len(frame_times) / elapsed:.0f} fps "
+          f"({len(frame_times) / elapsed / FRAME_RATE:.1f}x real time)")
+    print(f"Frame cost:       p50 {np.percentile(frame_times, 50):.3f} ms, p99 {np.percentile(frame_times, 99):.3f} ms, "
+          f"max {frame_times.max():.3f} ms")
+    if interval:
+        print(f"Missed deadlines: {missed_deadlines} ({missed_deadlines / len(frame_times):.2%}) "
+              f"at {interval * 1e3:.3f} ms per frame")
+
+
+if __name__ == "__main__":
+    app()
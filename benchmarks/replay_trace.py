@@ -0,0 +1,73 @@
+import hashlib
+import time
+import wave
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from src.config import SOUND_DATA_PATH
+from src.sound_manager import SoundManager
+from src.sound_trace import load_trace, replay_trace
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+@app.command()
+def main(
+        trace_path: Annotated[Path, typer.Argument(help="Sound trace recorded with ENABLE_SOUND_TRACE")],
+        output: Annotated[Optional[Path], typer.Option(help="Write the rendered match to a 16-bit WAV file")] = None):
+    logger.remove()
+    trace = load_trace(trace_path)
+    sound_manager = SoundManager(render_size=trace.render_size)
+    sound_manager.initialize(sample_rate=trace.sample_rate)
+    sound_manager.load_sounds(SOUND_DATA_PATH)
+
+    digest = hashlib.sha256()
+    blocks = []
+    render_time = 0.0
+    render = sound_manager.render
+
+    def timed_render() -> np.ndarray:
+        nonlocal render_time
+        start = time.perf_counter()
+        audio = render()
+        render_time += time.perf_counter() - start
+        return audio
+
+    # Shadowed on the instance so replay_trace's own loop is timed, command issue is whatever is left
+    sound_manager.render = timed_render
+    replay = replay_trace(trace, sound_manager)
+    replay_time = 0.0
+    while True:
+        start = time.perf_counter()
+        audio = next(replay, None)
+        replay_time += time.perf_counter() - start
+        if audio is None:
+            break
+        digest.update(audio.tobytes())
+        if output:
+            blocks.append(audio.copy())
+    command_time = replay_time - render_time
+    sound_manager.close()
+
+    print(f"Blocks:        {trace.block_count}")
+    print(f"Commands:      {len(trace.records)}")
+    print(f"Command issue: {command_time * 1e6 / max(trace.block_count, 1):.1f} us/block")
+    print(f"Render:        {render_time * 1e6 / max(trace.block_count, 1):.1f} us/block")
+    print(f"SHA-256:       {digest.hexdigest()}")
+
+    if output:
+        pcm = (np.clip(np.concatenate(blocks), -1.0, 1.0) * 32767).astype(np.int16)
+        with wave.open(str(output), 'wb') as wavefp:
+            wavefp.setnchannels(pcm.shape[1])
+            wavefp.setsampwidth(2)
+            wavefp.setframerate(trace.sample_rate)
+            wavefp.writeframes(pcm.tobytes())
+
+
+if __name__ == "__main__":
+    app()
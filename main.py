@@ -2,34 +2,58 @@ import asyncio
 import os
 
 import typer
-from dotenv import load_dotenv
-from pyftg.socket.aio.gateway import Gateway
 from typing_extensions import Annotated, Optional
 
-from src.core import SampleSoundGenAI
-from src.utils import setup_logging
-
 app = typer.Typer(pretty_exceptions_enable=False)
 
+# numpy, OpenAL, pyftg and grpc are imported where they are first needed, after the command line has been parsed,
+# so `--help` stays fast and the start-up log shows what the imports cost
+
+
+async def start_process(host: str, port: int, sound_genai=None, keep_alive: bool = True):
+    from pyftg.socket.aio.gateway import Gateway
+
+    from src.config import ENABLE_METRICS_SERVER, METRICS_PORT
+    from src.core import SampleSoundGenAI
+    from src.metrics_server import MetricsServer
+    from src.utils import log_startup
 
-async def start_process(host: str, port: int):
     host = os.environ.get("SERVER_HOST", host)
     port = int(os.environ.get("SERVER_PORT", port))
+    metrics_server = None
+    if ENABLE_METRICS_SERVER:
+        metrics_server = MetricsServer(port=int(os.environ.get("METRICS_PORT", METRICS_PORT)))
+        metrics_server.start()
+    if sound_genai is None:
+        log_startup("Modules imported")
+        sound_genai = SampleSoundGenAI()
+        log_startup("Ready for frames")
     gateway = Gateway(host, port)
-    sound_genai = SampleSoundGenAI()
     gateway.register_sound(sound_genai)
-    await gateway.start_sound(keep_alive=True)
+    await gateway.start_sound(keep_alive=keep_alive)
     await gateway.close()
+    if metrics_server:
+        metrics_server.close()
 
 
 @app.command()
 def main(
         host: Annotated[Optional[str], typer.Option(help="Host used by DareFightingICE")] = "127.0.0.1",
-        port: Annotated[Optional[int], typer.Option(help="Port used by DareFightingICE")] = 31415):
-    asyncio.run(start_process(host, port))
+        port: Annotated[Optional[int], typer.Option(help="Port used by DareFightingICE")] = 31415,
+        daemon: Annotated[bool, typer.Option(help="Load once and fork a ready worker for every game (not on Windows)")] = False):
+    if daemon:
+        from src.warm_daemon import run_daemon
+
+        run_daemon(lambda sound_genai: asyncio.run(start_process(host, port, sound_genai, keep_alive=False)))
+    else:
+        asyncio.run(start_process(host, port))
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from src.utils import setup_logging
+
     load_dotenv()
     setup_logging()
     app()
@@ -0,0 +1,85 @@
+import json
+import wave
+from pathlib import Path
+from typing import NamedTuple
+
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from src.audio_metrics import ONSET_FLOOR_DB, ONSET_THRESHOLD_DB, find_onset, pcm_to_float
+from src.config import DATA_PATH, TRIMMED_DATA_PATH
+from src.constants import action_sound_names, projectile_actions, walking_actions
+
+MANIFEST_NAME = 'manifest.json'
+
+# Loops keep their period, their leading silence is moved to the end instead of being cut
+looping_sounds = frozenset([action_sound_names[action] for action in walking_actions | projectile_actions] +
+                           ["Heartbeat.wav", "Beep.wav", "BGM_NEW0.wav"])
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+
+class TrimResult(NamedTuple):
+    name: str
+    sample_rate: int
+    duration_ms: float
+    onset_ms: float
+    trimmed_ms: float
+    looping: bool
+
+
+def trim_file(source: Path, target: Path, margin_ms: float, threshold_db: float, floor_db: float) -> TrimResult:
+    with wave.open(str(source), 'rb') as wavefp:
+        params = wavefp.getparams()
+        frames = wavefp.readframes(params.nframes)
+    frame_size = params.sampwidth * params.nchannels
+    samples = pcm_to_float(frames, params.sampwidth, params.nchannels)
+    onset = find_onset(samples, params.framerate, threshold_db, floor_db)
+    cut = max(onset - int(params.framerate * margin_ms / 1000), 0)
+    looping = source.name in looping_sounds
+    if looping:
+        trimmed = frames[cut * frame_size:] + frames[:cut * frame_size]
+    else:
+        trimmed = frames[cut * frame_size:]
+
+    with wave.open(str(target), 'wb') as wavefp:
+        wavefp.setnchannels(params.nchannels)
+        wavefp.setsampwidth(params.sampwidth)
+        wavefp.setframerate(params.framerate)
+        wavefp.writeframes(trimmed)
+    return TrimResult(source.name, params.framerate, 1000 * len(samples) / params.framerate,
+                      1000 * onset / params.framerate, 1000 * cut / params.framerate, looping)
+
+
+@app.command()
+def main(
+        source: Annotated[Path, typer.Option(help="Directory of the original sounds")] = DATA_PATH,
+        output: Annotated[Path, typer.Option(help="Directory the trimmed sounds and manifest are written to")] = TRIMMED_DATA_PATH,
+        margin_ms: Annotated[float, typer.Option(help="Silence kept in front of the detected onset")] = 5.0,
+        threshold_db: Annotated[float, typer.Option(help="Onset level relative to the loudest part of the sound")] = ONSET_THRESHOLD_DB,
+        floor_db: Annotated[float, typer.Option(help="Onset level never goes below this, in dBFS")] = ONSET_FLOOR_DB,
+        warn_ms: Annotated[float, typer.Option(help="Report sounds whose onset comes later than this")] = 20.0):
+    output.mkdir(parents=True, exist_ok=True)
+    results = [trim_file(file, output / file.name, margin_ms, threshold_db, floor_db)
+               for file in sorted(source.glob('*.wav'))]
+
+    print(f"{'sound':<24} {'rate':>6} {'length':>9} {'onset':>9} {'trimmed':>9}")
+    for result in results:
+        print(f"{result.name:<24} {result.sample_rate:>6} {result.duration_ms:7.1f}ms {result.onset_ms:7.1f}ms "
+              f"{result.trimmed_ms:7.1f}ms{' (loop, rotated)' if result.looping else ''}")
+    for result in results:
+        if result.onset_ms > warn_ms:
+            logger.warning("{} starts {:.1f} ms after the start of the file", result.name, result.onset_ms)
+
+    manifest = {result.name: {"sample_rate": result.sample_rate, "duration_ms": round(result.duration_ms, 3),
+                              "onset_ms": round(result.onset_ms, 3), "trimmed_ms": round(result.trimmed_ms, 3),
+                              "looping": result.looping}
+                for result in results}
+    (output / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+    print(f"{len(results)} sounds written to {output}, {sum(r.trimmed_ms for r in results if not r.looping):.1f} ms "
+          f"of leading silence removed from one-shots")
+
+
+if __name__ == "__main__":
+    app()
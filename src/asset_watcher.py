@@ -0,0 +1,73 @@
+import queue
+import threading
+import wave
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+from loguru import logger
+
+from src.config import HOT_RELOAD_INTERVAL
+from src.sound_files import decode_wav, measure_sound
+
+
+class ChangedSound(NamedTuple):
+    name: str
+    format: int
+    pcm: bytes
+    sample_rate: int
+    # Length and pre-roll in samples of the render clock
+    duration: int
+    onset: int
+
+
+class AssetWatcher:
+    data_path: Path
+    clock_rate: int
+    interval: float
+    changes: "queue.SimpleQueue[ChangedSound]"
+    stamps: Dict[str, Tuple[int, int]]
+
+    def __init__(self, data_path: Path, clock_rate: int, interval: float = HOT_RELOAD_INTERVAL) -> None:
+        self.data_path = data_path
+        self.clock_rate = clock_rate
+        self.interval = interval
+        self.changes = queue.SimpleQueue()
+        self.stamps = self.scan()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="asset-watcher", daemon=True)
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        stamps = {}
+        for file in self.data_path.glob('*.wav'):
+            try:
+                stat = file.stat()
+            except OSError:
+                # Removed or renamed between the listing and the stat, e.g. an editor saving through a temporary file
+                continue
+            stamps[file.name] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def start(self) -> None:
+        self.thread.start()
+        logger.info("Watching {} for changed sounds", self.data_path)
+
+    def run(self) -> None:
+        # Polls, decodes and measures on this thread, the frame loop only uploads finished PCM
+        while not self.stop_event.wait(self.interval):
+            for name, stamp in self.scan().items():
+                if self.stamps.get(name) == stamp:
+                    continue
+                try:
+                    alformat, pcm, sample_rate = decode_wav(self.data_path / name)
+                except (wave.Error, EOFError, KeyError, OSError) as e:
+                    # Most likely still being written, the next poll tries again
+                    logger.debug("Cannot decode {} yet: {}", name, e)
+                    continue
+                self.stamps[name] = stamp
+                duration, onset = measure_sound(alformat, pcm, sample_rate, self.clock_rate)
+                self.changes.put(ChangedSound(name, alformat, pcm, sample_rate, duration, onset))
+
+    def close(self) -> None:
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
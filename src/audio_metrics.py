@@ -0,0 +1,99 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SILENCE_FLOOR = 1e-4
+ONSET_THRESHOLD_DB = -40.0
+ONSET_FLOOR_DB = -60.0
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    return audio.mean(axis=1) if audio.ndim == 2 else audio
+
+
+def frame_signal(signal: np.ndarray, frame_size: int, hop_size: int) -> np.ndarray:
+    if len(signal) < frame_size:
+        signal = np.pad(signal, (0, frame_size - len(signal)))
+    return sliding_window_view(signal, frame_size)[::hop_size]
+
+
+def block_rms(audio: np.ndarray, block_size: int) -> np.ndarray:
+    # (blocks, channels) RMS of consecutive blocks, the trailing partial block is dropped
+    blocks = len(audio) // block_size
+    reshaped = audio[:blocks * block_size].reshape(blocks, block_size, -1)
+    return np.sqrt(np.mean(np.square(reshaped, dtype=np.float64), axis=1))
+
+
+def log_spectrogram(audio: np.ndarray, frame_size: int = 1024, hop_size: int = 512) -> np.ndarray:
+    frames = frame_signal(to_mono(audio).astype(np.float64), frame_size, hop_size)
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(frame_size), axis=1))
+    return 20 * np.log10(np.maximum(magnitude, SILENCE_FLOOR))
+
+
+def spectral_distance(audio: np.ndarray, reference: np.ndarray, frame_size: int = 1024, hop_size: int = 512) -> float:
+    # Mean log-spectral distance in dB over the frames where either signal is audible
+    spectrogram = log_spectrogram(audio, frame_size, hop_size)
+    reference_spectrogram = log_spectrogram(reference, frame_size, hop_size)
+    floor = 20 * np.log10(SILENCE_FLOOR)
+    audible = (spectrogram.max(axis=1) > floor) | (reference_spectrogram.max(axis=1) > floor)
+    if not audible.any():
+        return 0.0
+    difference = spectrogram[audible] - reference_spectrogram[audible]
+    return float(np.mean(np.sqrt(np.mean(np.square(difference), axis=1))))
+
+
+def energy_envelope(audio: np.ndarray, window_size: int, hop_size: int) -> np.ndarray:
+    frames = frame_signal(to_mono(audio).astype(np.float64), window_size, hop_size)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+def detect_onsets(audio: np.ndarray, window_size: int = 256, hop_size: int = 64,
+                  threshold: float = 0.01, ratio: float = 4.0) -> np.ndarray:
+    # Sample positions where the short-time energy jumps above both an absolute floor and the preceding window
+    envelope = energy_envelope(audio, window_size, hop_size)
+    previous = np.concatenate(([0.0], envelope[:-1]))
+    rising = (envelope > threshold) & (envelope > previous * ratio + SILENCE_FLOOR)
+    starts = np.flatnonzero(rising & ~np.concatenate(([False], rising[:-1])))
+    return starts * hop_size
+
+
+def detect_level_onsets(audio: np.ndarray, threshold: float, window_size: int = 64, hop_size: int = 16) -> np.ndarray:
+    # Sample positions where the short-time energy crosses threshold from below, for renders of a single sound where
+    # slow attacks never make the jump detect_onsets looks for
+    above = energy_envelope(audio, window_size, hop_size) >= threshold
+    starts = np.flatnonzero(above & ~np.concatenate(([False], above[:-1])))
+    return starts * hop_size
+
+
+def match_onsets(onsets: np.ndarray, reference: np.ndarray, tolerance: int) -> np.ndarray:
+    # Offset of the nearest onset for every reference onset, NaN when nothing lies within tolerance
+    padded = np.concatenate(([-np.inf], np.asarray(onsets, dtype=np.float64), [np.inf]))
+    reference = np.asarray(reference, dtype=np.float64)
+    index = np.searchsorted(padded, reference)
+    before = reference - padded[index - 1]
+    after = padded[index] - reference
+    nearest = np.where(after < before, after, -before)
+    nearest[np.abs(nearest) > tolerance] = np.nan
+    return nearest
+
+
+def pcm_to_float(frames: bytes, sample_width: int, channels: int) -> np.ndarray:
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    else:
+        # Only the most significant two bytes matter for finding where the sound starts
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, sample_width)[:, -2:]
+        samples = np.ascontiguousarray(raw).view(np.int16).ravel().astype(np.float32) / 32768
+    return samples.reshape(-1, channels)
+
+
+def find_onset(samples: np.ndarray, sample_rate: int, threshold_db: float = ONSET_THRESHOLD_DB,
+               floor_db: float = ONSET_FLOOR_DB) -> int:
+    # First frame whose short-time energy comes within threshold_db of the loudest window and above floor_db
+    window_size = max(sample_rate // 500, 1)
+    hop_size = max(sample_rate // 2000, 1)
+    envelope = energy_envelope(samples, window_size, hop_size)
+    if not len(envelope) or envelope.max() <= 0:
+        return 0
+    threshold = max(envelope.max() * 10 ** (threshold_db / 20), 10 ** (floor_db / 20))
+    loud = np.flatnonzero(envelope >= threshold)
+    return int(loud[0] * hop_size) if len(loud) else 0
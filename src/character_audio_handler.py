@@ -9,7 +9,9 @@ from pyftg_sound.models.audio_source import AudioSource
 from pyftg_sound.sound_manager import SoundManager
 
 from src.config import STAGE_HEIGHT, STAGE_WIDTH
-from src.constants import source_attrs
+from src.constants import (action_sound_names, neutral_actions,
+                           one_shot_actions, projectile_actions,
+                           source_attrs, walking_actions)
 from src.utils import is_guard
 
 
@@ -23,6 +25,9 @@ class CharacterAudioHandler:
     previous_action: str = None
     heart_beat_flag: bool = False
     current_projectiles: Dict[str, AttackData] = {}
+    # Lowered by the frame-budget governor
+    position_refresh_interval: int = 1
+    walking_enabled: bool = True
 
     player: bool
     character: CharacterData
@@ -91,7 +96,7 @@ class CharacterAudioHandler:
         if self.previous_enemy_side is None:
             self.previous_enemy_side = current_side  # Set without playing audio
         elif current_side != self.previous_enemy_side:
-            sound_file = f"{current_side.upper()}.wav"
+            sound_file = "LEFT.wav" if current_side == "LEFT" else "RIGHT.wav"
             self.sound_manager.play(
                 self.source_side_alert,
                 self.sound_manager.get_sound_buffer(sound_file),
@@ -99,7 +104,7 @@ class CharacterAudioHandler:
                 self.character.y,
                 False 
             )
-            logger.info(f"Enemy switched side to {current_side.upper()}, played {sound_file}")
+            logger.info("Enemy switched side to {}, played {}", current_side, sound_file)
             self.previous_enemy_side = current_side
 
 
@@ -117,33 +122,46 @@ class CharacterAudioHandler:
                 0,
                 False
             )
-            logger.info(f"Play sound: {alert_file} at ({self.character.x}, {self.character.y}) on frame {self.current_frame_number}")
+            logger.info("Play sound: {} at ({}, {}) on frame {}", alert_file, self.character.x, self.character.y, self.current_frame_number)
     
+    def is_projectile_live(self, projectile_id: str) -> bool:
+        for proj in self.character.projectile_attack:
+            if not proj.empty_flag and proj.identifier == projectile_id:
+                return True
+        return False
+
     def update_projectile(self):
+        if not self.source_projectiles_by_id:
+            return
+
+        refresh_positions = self.current_frame_number % self.position_refresh_interval == 0
+        for proj in self.character.projectile_attack:
+            if refresh_positions and not proj.empty_flag and proj.identifier in self.source_projectiles_by_id:
+                x = (proj.current_hit_area.left + proj.current_hit_area.right) // 2
+                y = (proj.current_hit_area.top + proj.current_hit_area.bottom) // 2
+                self.sound_manager.set_source_pos(self.source_projectiles_by_id[proj.identifier], x, y)
+                logger.trace("Set source position: source_projectile on frame {} at ({}, {})", self.current_frame_number, x, y)
+
+        # Only allocate the removal list on the frames where a projectile actually disappears
+        remove_projectiles = None
         for projectile_id in self.source_projectiles_by_id:
-            for _, proj in enumerate(self.character.projectile_attack):
-                if not proj.empty_flag and proj.identifier == projectile_id:
-                    x = (proj.current_hit_area.left + proj.current_hit_area.right) // 2
-                    y = (proj.current_hit_area.top + proj.current_hit_area.bottom) // 2
-                    self.sound_manager.set_source_pos(self.source_projectiles_by_id[projectile_id], x, y)
-                    logger.info(f"Set source position: source_projectile on frame {self.current_frame_number} at ({x}, {y})")
-
-        remove_projectiles = []
-        for projectile_id in self.source_projectiles_by_id:
-            if projectile_id not in [t.identifier for t in self.character.projectile_attack if not t.empty_flag]:
+            if not self.is_projectile_live(projectile_id):
                 self.sound_manager.stop(self.source_projectiles_by_id[projectile_id])
-                logger.info(f"Stop source: source_projectile on frame {self.current_frame_number}")
+                logger.info("Stop source: source_projectile on frame {}", self.current_frame_number)
                 self.sound_manager.remove_source(self.source_projectiles_by_id[projectile_id])
+                if remove_projectiles is None:
+                    remove_projectiles = []
                 remove_projectiles.append(projectile_id)
 
-        for projectile_id in remove_projectiles:
-            del self.source_projectiles_by_id[projectile_id]
-            del self.current_projectiles[projectile_id]
+        if remove_projectiles is not None:
+            for projectile_id in remove_projectiles:
+                del self.source_projectiles_by_id[projectile_id]
+                del self.current_projectiles[projectile_id]
 
     def hit_attack(self, attack: AttackData, opponent: 'CharacterAudioHandler') -> None:
         if is_guard(self.character.action, attack):  # check guard
             self.sound_manager.play(self.source_landing, self.sound_manager.get_sound_buffer("WeakGuard.wav"), self.character.x, self.character.y, False)
-            logger.info(f"Play sound: WeakGuard.wav on frame {self.current_frame_number} at ({self.character.x}, {self.character.y})")
+            logger.info("Play sound: WeakGuard.wav on frame {} at ({}, {})", self.current_frame_number, self.character.x, self.character.y)
         else:
             # check being hit
             if attack.attack_type == 4:
@@ -154,14 +172,13 @@ class CharacterAudioHandler:
             else:
                 if attack.down_prop:
                     self.sound_manager.play(self.source_landing, self.sound_manager.get_sound_buffer("HitB.wav"), self.character.x, self.character.y, False)
-                    logger.info(f"Play sound: HitB.wav on frame {self.current_frame_number} at ({self.character.x}, {self.character.y})")
+                    logger.info("Play sound: HitB.wav on frame {} at ({}, {})", self.current_frame_number, self.character.x, self.character.y)
                 else:
                     self.sound_manager.play(self.source_landing, self.sound_manager.get_sound_buffer("HitA.wav"), self.character.x, self.character.y, False)
-                    logger.info(f"Play sound: HitA.wav on frame {self.current_frame_number} at ({self.character.x}, {self.character.y})")
+                    logger.info("Play sound: HitA.wav on frame {} at ({}, {})", self.current_frame_number, self.character.x, self.character.y)
 
     def run_action(self, action: Action) -> None:
-        action_name = action.name.upper()
-        sound_name = action_name + '.wav'
+        sound_name = action_sound_names[action]
 
         x = self.character.x
         y = self.character.y
@@ -169,50 +186,46 @@ class CharacterAudioHandler:
         if not hasattr(self, "previous_action_name"):
             self.previous_action_name = ""
             
-        if action_name in ["STAND", "AIR"]:
+        if action in neutral_actions:
             self.temp = ' '
             self.temp2 = ' '
             self.temp3 = ' '
         
-        if action_name in ["JUMP", "FOR_JUMP", "BACK_JUMP", "THROW_A", "THROW_B", "THROW_HIT", "THROW_SUFFER", 
-                      "STAND_A", "STAND_B", "CROUCH_A", "CROUCH_B", "AIR_A", "AIR_B", "AIR_DA", "AIR_DB", 
-                      "STAND_FA", "STAND_FB", "CROUCH_FA", "CROUCH_FB", "AIR_FA", "AIR_FB", "AIR_UA", "AIR_UB", 
-                      "STAND_F_D_DFA", "STAND_F_D_DFB", "STAND_D_DB_BA", "STAND_D_DB_BB", "AIR_F_D_DFA", 
-                      "AIR_F_D_DFB", "AIR_D_DB_BA", "AIR_D_DB_BB"]:
+        if action in one_shot_actions:
             if sound_name != self.temp3:
                 self.sound_manager.play(self.source_default, self.sound_manager.get_sound_buffer(sound_name), x, y, False)
-                logger.info(f"Play sound: {sound_name} on frame {self.current_frame_number} at ({x}, {y})")
+                logger.info("Play sound: {} on frame {} at ({}, {})", sound_name, self.current_frame_number, x, y)
                 self.temp3 = sound_name
-        elif action_name == "CROUCH":
+        elif action is Action.CROUCH:
             self.temp3 = ' '
             if sound_name != self.temp:
                 self.sound_manager.play(self.source_default, self.sound_manager.get_sound_buffer(sound_name), x, y, False)
-                logger.info(f"Play sound: {sound_name} on frame {self.current_frame_number} at ({x}, {y})")
+                logger.info("Play sound: {} on frame {} at ({}, {})", sound_name, self.current_frame_number, x, y)
                 self.temp = sound_name
-        elif action_name in ["FORWARD_WALK", "DASH", "BACK_STEP"]:
-            if sound_name != self.temp2:
+        elif action in walking_actions:
+            if sound_name != self.temp2 and self.walking_enabled:
                 self.sound_manager.play(self.source_walking, self.sound_manager.get_sound_buffer(sound_name), x, y, True)
-                logger.info(f"Play sound: {sound_name} on frame {self.current_frame_number} at ({x}, {y})")
+                logger.info("Play sound: {} on frame {} at ({}, {})", sound_name, self.current_frame_number, x, y)
                 self.temp2 = sound_name
-        elif action_name in ["STAND_D_DF_FA", "STAND_D_DF_FB", "AIR_D_DF_FA", "AIR_D_DF_FB", "STAND_D_DF_FC"]:
+        elif action in projectile_actions:
             if sound_name == self.temp3:
                 return
             for i, proj in enumerate(self.character.projectile_attack):
                 if not proj.empty_flag:
                     projectile_id = proj.identifier
-                    if projectile_id not in self.current_projectiles.keys():
+                    if projectile_id not in self.current_projectiles:
                         self.current_projectiles[projectile_id] = proj
                         projectile_source = self.sound_manager.create_audio_source(source_attrs)
                         self.source_projectiles_by_id[projectile_id] = projectile_source
                         self.sound_manager.play(projectile_source, self.sound_manager.get_sound_buffer(sound_name), x, y, True)
-                        logger.info(f"Play sound: {sound_name} on frame {self.current_frame_number} at ({x}, {y})")
+                        logger.info("Play sound: {} on frame {} at ({}, {})", sound_name, self.current_frame_number, x, y)
                         self.temp3 = sound_name
                         break
                     
     def check_landing(self):
         if self.character.bottom >= STAGE_HEIGHT and self.character.bottom != self.previous_bottom:
             self.sound_manager.play(self.source_landing, self.sound_manager.get_sound_buffer("LANDING.wav"), self.character.x, self.character.y, False)
-            logger.info(f"Play sound: LANDING.wav on frame {self.current_frame_number} at ({self.character.x}, {self.character.y})")
+            logger.info("Play sound: LANDING.wav on frame {} at ({}, {})", self.current_frame_number, self.character.x, self.character.y)
         self.previous_bottom = self.character.bottom
 
     def check_border_alert(self):
@@ -228,7 +241,7 @@ class CharacterAudioHandler:
                     self.sound_manager.get_sound_buffer("Border_Alert.wav"),
                     0, 0, False
                 )
-                logger.info(f"Play sound: Border_Alert.wav on frame {self.current_frame_number} at (0, 0)")
+                logger.info("Play sound: Border_Alert.wav on frame {} at (0, 0)", self.current_frame_number)
 
         elif (self.character.right == STAGE_WIDTH and self.character.speed_x > 0):
             if not self.sound_manager.is_playing(self.source_border_alert):
@@ -237,7 +250,7 @@ class CharacterAudioHandler:
                     self.sound_manager.get_sound_buffer("BorderAlert.wav"),
                     STAGE_WIDTH, 0, False
                 )
-                logger.info(f"Play sound: BorderAlert.wav on frame {self.current_frame_number} at ({STAGE_WIDTH}, 0)")
+                logger.info("Play sound: BorderAlert.wav on frame {} at ({}, 0)", self.current_frame_number, STAGE_WIDTH)
     
 
     def check_heart_beat(self):
@@ -255,7 +268,7 @@ class CharacterAudioHandler:
             # Stop heartbeat if playing
             if self.sound_manager.is_playing(self.source_heart_beat):
                 self.sound_manager.stop(self.source_heart_beat)
-                logger.info(f"Stop heartbeat at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Stop heartbeat at HP={}, frame={}", hp, self.current_frame_number)
 
             # Start beeping if not already playing
             if not self.sound_manager.is_playing(self.source_beeping):
@@ -267,13 +280,13 @@ class CharacterAudioHandler:
                     0,
                     True  # Loop enabled
                 )
-                logger.info(f"Start looping beeping at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Start looping beeping at HP={}, frame={}", hp, self.current_frame_number)
         # --- 50 <= HP < 200: Only Heartbeat ---
         elif hp < 200:
             # Stop beeping if playing
             if self.sound_manager.is_playing(self.source_beeping):
                 self.sound_manager.stop(self.source_beeping)
-                logger.info(f"Stop beeping at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Stop beeping at HP={}, frame={}", hp, self.current_frame_number)
 
             # Start heartbeat if not already playing
             if not self.sound_manager.is_playing(self.source_heart_beat):
@@ -285,15 +298,15 @@ class CharacterAudioHandler:
                     0,
                     True  # Loop enabled
                 )
-                logger.info(f"Start looping heartbeat at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Start looping heartbeat at HP={}, frame={}", hp, self.current_frame_number)
         # --- HP >= 200: Stop All ---
         else:
             if self.sound_manager.is_playing(self.source_heart_beat):
                 self.sound_manager.stop(self.source_heart_beat)
-                logger.info(f"Stop heartbeat at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Stop heartbeat at HP={}, frame={}", hp, self.current_frame_number)
             if self.sound_manager.is_playing(self.source_beeping):
                 self.sound_manager.stop(self.source_beeping)
-                logger.info(f"Stop beeping at HP={hp}, frame={self.current_frame_number}")
+                logger.info("Stop beeping at HP={}, frame={}", hp, self.current_frame_number)
 
 
     def check_energy_charge(self):
@@ -301,10 +314,10 @@ class CharacterAudioHandler:
             self.pre_energy = self.character.energy
             if self.player:
                 self.sound_manager.play(self.source_energy_change, self.sound_manager.get_sound_buffer("EnergyCharge.wav"), 0, 0, False)
-                logger.info(f"Play sound: EnergyCharge.wav on frame {self.current_frame_number} at (0, 0)")
+                logger.info("Play sound: EnergyCharge.wav on frame {} at (0, 0)", self.current_frame_number)
             else:
                 self.sound_manager.play(self.source_energy_change, self.sound_manager.get_sound_buffer("EnergyCharge.wav"), STAGE_WIDTH, 0, False)
-                logger.info(f"Play sound: EnergyCharge.wav on frame {self.current_frame_number} at ({STAGE_WIDTH}, 0)")
+                logger.info("Play sound: EnergyCharge.wav on frame {} at ({}, 0)", self.current_frame_number, STAGE_WIDTH)
     
     def update(self, frame_data: FrameData):
         self.current_frame_number = frame_data.current_frame_number
@@ -327,15 +340,45 @@ class CharacterAudioHandler:
             self.temp2 = " "
             if self.sound_manager.is_playing(self.source_walking):
                 self.sound_manager.stop(self.source_walking)
-                logger.info(f"Stop source: source_walking on frame {self.current_frame_number}")
-        else:
+                logger.info("Stop source: source_walking on frame {}", self.current_frame_number)
+        elif self.current_frame_number % self.position_refresh_interval == 0:
             self.sound_manager.set_source_pos(self.source_walking, self.character.x, self.character.y)
-            logger.info(f"Set source position: source_walking on frame {self.current_frame_number} at ({self.character.x}, {self.character.y})")
+            logger.trace("Set source position: source_walking on frame {} at ({}, {})", self.current_frame_number, self.character.x, self.character.y)
 
         self.run_action(self.character.action)
         #self.run_action(self.opp_character.action)
         self.update_projectile()
 
+    def set_walking_enabled(self, enabled: bool) -> None:
+        self.walking_enabled = enabled
+        if enabled:
+            return
+        # Cleared so the loop starts again by itself once walking is enabled
+        self.temp2 = ' '
+        if self.sound_manager.is_playing(self.source_walking):
+            self.sound_manager.stop(self.source_walking)
+            logger.info("Stop source: source_walking on frame {}", self.current_frame_number)
+
+    def resync(self, frame_data: FrameData) -> None:
+        # Takes the frame as the new baseline, so the transitions missed in a frame gap do not fire late
+        self.current_frame_number = frame_data.current_frame_number
+        self.character = frame_data.get_character(self.player)
+        self.opp_character = frame_data.get_character(not self.player)
+
+        self.previous_bottom = self.character.bottom
+        if self.character.energy > self.pre_energy + 50:
+            self.pre_energy = self.character.energy
+        if self.previous_enemy_side is not None:
+            self.previous_enemy_side = "LEFT" if self.opp_character.x < self.character.x else "RIGHT"
+        action = self.character.action
+        if action in one_shot_actions:
+            self.temp3 = action_sound_names[action]
+        elif action in projectile_actions:
+            # Left unmarked, so run_action gives the projectiles already in flight their sources
+            self.temp3 = ' '
+        elif action is Action.CROUCH:
+            self.temp = action_sound_names[action]
+
     def reset(self) -> None:
         self.pre_energy = 0
         self.temp = ' '
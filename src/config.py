@@ -1,14 +1,83 @@
 from pathlib import Path
 
 DATA_PATH = Path('data/sounds')
+# Built from DATA_PATH with `python -m src.asset_pipeline`
+USE_TRIMMED_ASSETS = False
+TRIMMED_DATA_PATH = Path('data/trimmed')
+SOUND_DATA_PATH = TRIMMED_DATA_PATH if USE_TRIMMED_ASSETS else DATA_PATH
 
 STAGE_WIDTH = 960
 STAGE_HEIGHT = 640
 
 ENABLE_LOGGING = True
 ENABLE_AUDIO_OUTPUT = True
+ENABLE_SOUND_TRACE = False
+ENABLE_MATCH_RECORDING = False
+# Chrome trace-event spans of every frame's steps, kept in memory and written at game end
+ENABLE_FRAME_TRACING = False
+FRAME_TRACE_CAPACITY = 200_000
+# Log live sources and buffers by the code that created them at every round end, and flag sources a round left behind
+ENABLE_LIFECYCLE_AUDIT = False
+# Also diff tracemalloc snapshots between rounds, slows every allocation down considerably
+ENABLE_MEMORY_DIFF = False
+MEMORY_DIFF_FRAMES = 1
+MEMORY_DIFF_TOP = 10
+# SIGUSR1 profiles the frame loop for PROFILE_DURATION seconds, for sessions that cannot be restarted
+ENABLE_SIGNAL_PROFILER = True
+PROFILE_DURATION = 30.0
+# Prometheus text endpoint over the counters in src.metrics, started by main.py. METRICS_PORT overrides the port.
+# Off by default, it opens a listening socket on every host the sound AI runs on
+ENABLE_METRICS_SERVER = False
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9464
+# `main.py --daemon` waits this long before releasing the next worker after one could not reach the server
+DAEMON_RETRY_INTERVAL = 2.0
+
+# Watch DATA_PATH and swap changed sounds in between frames, for sound design sessions
+ENABLE_HOT_RELOAD = False
+HOT_RELOAD_INTERVAL = 0.5
+
+SOUND_TRACE_PATH = Path('logs/traces')
+MATCH_RECORDING_PATH = Path('logs/matches')
+FRAME_TRACE_PATH = Path('logs/frame_traces')
+PROFILE_PATH = Path('logs/profiles')
 
 SOUND_SAMPLE_RATE = 48000
 SOUND_RENDER_SIZE = 800
 
 BGM_VOLUME = 0.6
+
+# is_playing is answered from buffer durations, the driver is asked every this many frames to catch drift
+PLAYBACK_CHECK_INTERVAL = 300
+
+# Mix once in the virtual renderer and stream the blocks to the audio device instead of mixing every source twice
+ENABLE_OUTPUT_FAN_OUT = True
+OUTPUT_QUEUE_BLOCKS = 3
+# Mix the fixed-position cues in constants.prerendered_cues from stereo renders made at load time. Only takes effect
+# with ENABLE_OUTPUT_FAN_OUT or without audio output, the device renderer never sees the mixed renders
+ENABLE_PRERENDERED_CUES = True
+
+# Mix in a separate process fed through shared memory, so OpenAL does not compete with frame handling for the GIL.
+# The worker mixes a frame's block while the next frame is handled, so audio_sample returns it one frame later
+ENABLE_RENDER_WORKER = False
+RENDER_WORKER_COMMAND_SLOTS = 4096
+RENDER_WORKER_BLOCK_SLOTS = 4
+
+# After this many frames missed in a row the handlers adopt the new state silently instead of playing the transitions
+FRAME_GAP_RESYNC = 30
+
+# Steps sound quality down through governor.Tier while processing + audio_sample cost too much of a frame.
+# Off by default, it changes what is heard whenever the host is slow
+ENABLE_GOVERNOR = False
+FRAME_BUDGET = 1 / 60
+GOVERNOR_DEGRADE_RATIO = 0.8
+GOVERNOR_DEGRADE_FRAMES = 30
+GOVERNOR_RECOVER_RATIO = 0.4
+GOVERNOR_RECOVER_FRAMES = 300
+# Walking and projectile positions are refreshed every this many frames once the governor skips refreshes
+GOVERNOR_POSITION_REFRESH_INTERVAL = 4
+# Voices allowed at once in the voice limit tier, priority_sound_names are always played
+GOVERNOR_VOICE_LIMIT = 8
+
+# Freeze the objects created at start-up and only run full collections at round end
+ENABLE_GC_FREEZE = True
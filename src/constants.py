@@ -1,5 +1,43 @@
+from pyftg.models.enums.action import Action
 from pyftg_sound.openal import al
 
+from src.config import STAGE_HEIGHT, STAGE_WIDTH
+
 source_attrs = {
     al.AL_ROLLOFF_FACTOR: 0.01
-}
\ No newline at end of file
+}
+
+listener_position = (STAGE_WIDTH / 2, 0, STAGE_HEIGHT / 2)
+listener_orientation = (0, 0, -1, 0, 1, 0)
+
+action_sound_names = {action: action.name.upper() + '.wav' for action in Action}
+
+one_shot_actions = frozenset([
+    Action.JUMP, Action.FOR_JUMP, Action.BACK_JUMP, Action.THROW_A, Action.THROW_B, Action.THROW_HIT,
+    Action.THROW_SUFFER, Action.STAND_A, Action.STAND_B, Action.CROUCH_A, Action.CROUCH_B, Action.AIR_A,
+    Action.AIR_B, Action.AIR_DA, Action.AIR_DB, Action.STAND_FA, Action.STAND_FB, Action.CROUCH_FA,
+    Action.CROUCH_FB, Action.AIR_FA, Action.AIR_FB, Action.AIR_UA, Action.AIR_UB, Action.STAND_F_D_DFA,
+    Action.STAND_F_D_DFB, Action.STAND_D_DB_BA, Action.STAND_D_DB_BB, Action.AIR_F_D_DFA, Action.AIR_F_D_DFB,
+    Action.AIR_D_DB_BA, Action.AIR_D_DB_BB
+])
+walking_actions = frozenset([Action.FORWARD_WALK, Action.DASH, Action.BACK_STEP])
+projectile_actions = frozenset([
+    Action.STAND_D_DF_FA, Action.STAND_D_DF_FB, Action.AIR_D_DF_FA, Action.AIR_D_DF_FB, Action.STAND_D_DF_FC
+])
+neutral_actions = frozenset([Action.STAND, Action.AIR])
+
+# Cues that tell the player they hit, got hit or guarded, or that health or time is running out.
+# The governor's voice limit never drops these
+priority_sound_names = frozenset(["HitA.wav", "HitB.wav", "WeakGuard.wav", "THROW_HIT.wav", "THROW_SUFFER.wav",
+                                  "Heartbeat.wav", "Beep.wav", "5SECTIMED.wav"])
+
+# (sound, x, y, gain) of cues that always play at the same spot, mixed from SoundManager's prerendered cache
+prerendered_cues = [
+    ("EnergyCharge.wav", 0, 0, 1.0),
+    ("EnergyCharge.wav", STAGE_WIDTH, 0, 1.0),
+    ("5SECTIMED.wav", STAGE_WIDTH // 2, 0, 1.0),
+    ("Beep.wav", STAGE_WIDTH // 2, 0, 0.5),
+    ("Heartbeat.wav", STAGE_WIDTH // 2, 0, 3.0),
+    ("Border_Alert.wav", 0, 0, 1.0),
+    ("BorderAlert.wav", STAGE_WIDTH, 0, 1.0),
+]
@@ -1,4 +1,6 @@
-from typing import List
+import time
+from datetime import datetime
+from typing import List, Optional
 
 from loguru import logger
 from pyftg.aiinterface.soundgenai_interface import SoundGenAIInterface
@@ -6,57 +8,154 @@ from pyftg.models.frame_data import FrameData
 from pyftg.models.game_data import GameData
 from pyftg.models.round_result import RoundResult
 from pyftg_sound.models.audio_source import AudioSource
-from pyftg_sound.models.sound_renderer import SoundRenderer
-from pyftg_sound.sound_manager import SoundManager
 
 from src.character_audio_handler import CharacterAudioHandler
-from src.config import (BGM_VOLUME, DATA_PATH, ENABLE_AUDIO_OUTPUT,
-                        SOUND_RENDER_SIZE, SOUND_SAMPLE_RATE, STAGE_HEIGHT,
+from src.config import (BGM_VOLUME, ENABLE_AUDIO_OUTPUT, ENABLE_FRAME_TRACING,
+                        ENABLE_GC_FREEZE, ENABLE_GOVERNOR, ENABLE_HOT_RELOAD,
+                        ENABLE_LIFECYCLE_AUDIT, ENABLE_LOGGING,
+                        ENABLE_MATCH_RECORDING, ENABLE_MEMORY_DIFF,
+                        ENABLE_RENDER_WORKER, ENABLE_SIGNAL_PROFILER,
+                        ENABLE_SOUND_TRACE,
+                        FRAME_GAP_RESYNC, FRAME_TRACE_PATH, GOVERNOR_POSITION_REFRESH_INTERVAL,
+                        GOVERNOR_VOICE_LIMIT, MATCH_RECORDING_PATH,
+                        SOUND_DATA_PATH, SOUND_RENDER_SIZE,
+                        SOUND_SAMPLE_RATE, SOUND_TRACE_PATH, STAGE_HEIGHT,
                         STAGE_WIDTH)
 from src.constants import source_attrs
-from src.utils import detection_hit
+from src.governor import Governor, Tier
+from src.lifecycle_audit import LifecycleAuditor
+from src.match_recorder import MatchRecorder
+from src.metrics import FRAME_COST_BUCKETS_MS, Counter, Gauge, Histogram, metrics
+from src.profiler import SignalProfiler
+from src.render_worker import RenderWorkerSoundManager
+from src.sound_manager import SoundManager
+from src.sound_trace import SoundTraceRecorder
+from src.tracing import FrameTracer
+from src.utils import collect_gc, detection_hit, freeze_gc
 
 
 class SampleSoundGenAI(SoundGenAIInterface):
     sound_manager: SoundManager
     source_bgm: AudioSource
-    character_handlers: List[CharacterAudioHandler] = []
-
-    def __init__(self):
-        self.sound_manager = SoundManager()
-        virtual_renderer = SoundRenderer.create_virtual_renderer(sample_rate=SOUND_SAMPLE_RATE)
-        self.sound_manager.set_virtual_renderer(virtual_renderer)
-        if ENABLE_AUDIO_OUTPUT:
-            default_renderer = SoundRenderer.create_default_renderer()
-            self.sound_manager.set_default_renderer(default_renderer)
-        self.sound_manager.set_listener_position(STAGE_WIDTH / 2, 0, STAGE_HEIGHT / 2)
-        self.sound_manager.set_listener_orientation(0, 0, -1, 0, 1, 0)
+    character_handlers: List[CharacterAudioHandler]
+    match_recorder: Optional[MatchRecorder]
+    enable_sound_trace: bool
+    last_frame_number: int
+    dropped_frames: Counter
+    frame_gaps: Counter
+    stale_frames: Counter
+    handler_resyncs: Counter
+    frames_processed: Counter
+    frame_cost: Histogram
+    active_voices: Gauge
+    governor: Optional[Governor]
+    frame_start: float
+    tracer: Optional[FrameTracer]
+    profiler: Optional[SignalProfiler]
+    auditor: Optional[LifecycleAuditor]
+    closed: bool
+
+    def __init__(self, enable_audio_output: bool = ENABLE_AUDIO_OUTPUT, enable_sound_trace: bool = ENABLE_SOUND_TRACE):
+        # The trace recorder needs the mixer in this process
+        self.enable_sound_trace = enable_sound_trace and not ENABLE_RENDER_WORKER
+        if ENABLE_RENDER_WORKER:
+            self.sound_manager = RenderWorkerSoundManager(render_size=SOUND_RENDER_SIZE)
+        elif self.enable_sound_trace:
+            self.sound_manager = SoundTraceRecorder(render_size=SOUND_RENDER_SIZE)
+        else:
+            self.sound_manager = SoundManager(render_size=SOUND_RENDER_SIZE)
+        self.closed = False
+        self.auditor = LifecycleAuditor(self.sound_manager, ENABLE_MEMORY_DIFF) if ENABLE_LIFECYCLE_AUDIT else None
+        self.sound_manager.initialize(sample_rate=SOUND_SAMPLE_RATE, enable_audio_output=enable_audio_output)
         logger.info("Sound manager has been initialized.")
 
-        for file in DATA_PATH.iterdir():
-            self.sound_manager.create_audio_buffer(file)
+        self.sound_manager.load_sounds(SOUND_DATA_PATH)
         logger.info("Sound effects have been loaded.")
+        if ENABLE_HOT_RELOAD:
+            self.sound_manager.start_hot_reload(SOUND_DATA_PATH)
 
         self.source_bgm = self.sound_manager.create_audio_source(source_attrs)
         self.sound_manager.set_source_gain(self.source_bgm, BGM_VOLUME)
-        self.character_handlers.append(CharacterAudioHandler(self.sound_manager, True))
-        self.character_handlers.append(CharacterAudioHandler(self.sound_manager, False))
+        self.character_handlers = [
+            CharacterAudioHandler(self.sound_manager, True),
+            CharacterAudioHandler(self.sound_manager, False),
+        ]
+        self.match_recorder = MatchRecorder(MATCH_RECORDING_PATH) if ENABLE_MATCH_RECORDING else None
+        if self.auditor:
+            self.auditor.start_tracking()
+        self.last_frame_number = -1
+        self.dropped_frames = metrics.counter('sound_dropped_frames_total', "Frames the gateway never delivered")
+        self.frame_gaps = metrics.counter('sound_frame_gaps_total', "Runs of consecutive missing frames")
+        self.stale_frames = metrics.counter('sound_stale_frames_total', "Late, repeated or out-of-order frames skipped")
+        self.handler_resyncs = metrics.counter('sound_handler_resyncs_total',
+                                               "Gaps long enough for the handlers to resync instead of catching up")
+        self.frames_processed = metrics.counter('sound_frames_processed_total', "Frames accepted and handled")
+        self.frame_cost = metrics.histogram('sound_frame_cost_ms', FRAME_COST_BUCKETS_MS,
+                                            "Time spent in processing and audio_sample per frame")
+        self.active_voices = metrics.gauge('sound_active_voices', "Sources playing after the last rendered block")
+        self.governor = Governor() if ENABLE_GOVERNOR else None
+        self.frame_start = 0.0
+        self.tracer = FrameTracer() if ENABLE_FRAME_TRACING else None
+        if self.tracer:
+            self.instrument_frame_tracing()
+        self.profiler = None
+        if ENABLE_SIGNAL_PROFILER:
+            profiler = SignalProfiler()
+            if profiler.install():
+                profiler.instrument(self, ["get_information", "processing", "audio_sample"])
+                self.profiler = profiler
+
+        if ENABLE_GC_FREEZE:
+            freeze_gc()
+            logger.info("Start-up objects frozen, full collections deferred to round end")
+
+    def instrument_frame_tracing(self):
+        self.tracer.instrument(self, ["get_information", "processing", "detect_projectile_hits", "detect_attack_hit",
+                                      "audio_sample"], "frame")
+        for character_handler in self.character_handlers:
+            self.tracer.instrument(character_handler, ["update", "hit_attack", "check_landing", "check_border_alert",
+                                                       "check_heart_beat", "check_energy_charge",
+                                                       "update_enemy_side_audio", "check_timer_alert", "run_action",
+                                                       "update_projectile"], "handler")
+        self.tracer.instrument(self.sound_manager, ["play3d", "stop", "set_source_pos3d", "set_source_gain"], "sound")
+        self.tracer.instrument(self.sound_manager, ["render"], "render")
 
     def initialize(self, game_data: GameData):
         logger.info("Initialize")
 
     def get_information(self, frame_data: FrameData):
         self.frame_data = frame_data
+        if self.tracer:
+            self.tracer.frame_number = frame_data.current_frame_number
+        if self.match_recorder:
+            self.match_recorder.record_frame(frame_data)
 
     def processing(self):
+        self.frame_start = time.perf_counter()
+        self.sound_manager.begin_frame(self.frame_data.current_frame_number)
         if self.frame_data.empty_flag or self.frame_data.current_frame_number < 0:
             return
+        # Usually frame 0, but that frame can be one the gateway dropped
+        round_start = self.last_frame_number < 0
+        if not self.accept_frame(self.frame_data.current_frame_number):
+            return
+        self.frames_processed.inc()
 
-        if self.frame_data.current_frame_number == 0:
-            self.sound_manager.set_source_gain(self.source_bgm, 0.3)
-            self.sound_manager.play(self.source_bgm, self.sound_manager.get_sound_buffer("BGM_NEW0.wav"), STAGE_WIDTH // 2, STAGE_HEIGHT // 2, True)
-            logger.info(f"Play sound: BGM_NEW0.wav at ({STAGE_WIDTH // 2}, {STAGE_HEIGHT // 2}) with loop=True")
+        if round_start:
+            bgm_buffer = self.sound_manager.get_sound_buffer("BGM_NEW0.wav")
+            if bgm_buffer is None:
+                logger.warning("BGM_NEW0.wav is not in {}, playing without BGM", SOUND_DATA_PATH)
+            else:
+                self.sound_manager.set_source_gain(self.source_bgm, 0.3)
+                self.sound_manager.play(self.source_bgm, bgm_buffer, STAGE_WIDTH // 2, STAGE_HEIGHT // 2, True)
+                logger.info("Play sound: BGM_NEW0.wav at ({}, {}) with loop=True", STAGE_WIDTH // 2, STAGE_HEIGHT // 2)
+
+        self.detect_projectile_hits()
+        for i in range(2):
+            self.detect_attack_hit(i)
+            self.character_handlers[i].update(self.frame_data)
 
+    def detect_projectile_hits(self):
         for i in range(2):
             player_number = i == 0
             opponent_index = 1 if player_number else 0
@@ -65,30 +164,108 @@ class SampleSoundGenAI(SoundGenAIInterface):
                 if detection_hit(self.frame_data.get_character(not player_number), p):
                     self.character_handlers[i].hit_attack(p, self.character_handlers[opponent_index])
 
-        for i in range(2):
-            player_number = i == 0
-            opponent_index = 1 if player_number else 0
-            attack = self.frame_data.get_character(player_number).attack_data
-            if detection_hit(self.frame_data.get_character(not player_number), attack):
-                self.character_handlers[i].hit_attack(attack, self.character_handlers[opponent_index])
+    def detect_attack_hit(self, i: int):
+        player_number = i == 0
+        opponent_index = 1 if player_number else 0
+        attack = self.frame_data.get_character(player_number).attack_data
+        if detection_hit(self.frame_data.get_character(not player_number), attack):
+            self.character_handlers[i].hit_attack(attack, self.character_handlers[opponent_index])
 
-            self.character_handlers[i].update(self.frame_data)
+    def accept_frame(self, frame_number: int) -> bool:
+        # Frame numbers restart at 0 every round and round_end resets last_frame_number, so a frame 0 in the middle of
+        # a round is as late as any other frame at or behind the last one
+        if frame_number <= self.last_frame_number:
+            self.stale_frames.inc()
+            logger.debug("Skipped stale frame {} after frame {}", frame_number, self.last_frame_number)
+            return False
+        gap = frame_number - self.last_frame_number - 1
+        self.last_frame_number = frame_number
+        if gap > 0:
+            # The checks compare against the last state they saw, so a short gap comes out as the net transitions.
+            # A long one would only replay what the player can no longer act on
+            self.dropped_frames.inc(gap)
+            self.frame_gaps.inc()
+            if gap >= FRAME_GAP_RESYNC:
+                self.handler_resyncs.inc()
+                for character_handler in self.character_handlers:
+                    character_handler.resync(self.frame_data)
+            logger.warning("Missed {} frames before frame {}{}", gap, frame_number,
+                           ", resynced" if gap >= FRAME_GAP_RESYNC else "")
+        return True
 
     def round_end(self, round_result: RoundResult):
         logger.info("Round end")
+        self.last_frame_number = -1
+        if self.match_recorder:
+            self.match_recorder.record_round_end(round_result)
         for i in range(2):
             self.character_handlers[i].reset()
         self.sound_manager.stop(self.source_bgm)
         self.sound_manager.stop_all()
         logger.info("Stop all sound")
+        self.sound_manager.release_retired_buffers()
+        self.report_cue_latency()
+        self.frame_cost.reset_window()
+        if ENABLE_GC_FREEZE:
+            collect_gc()
+        if self.auditor:
+            self.auditor.audit_round()
+
+    def report_cue_latency(self):
+        cue_latency = self.sound_manager.sound_metrics.cue_latency
+        p50, p95, p99 = cue_latency.percentiles([50, 95, 99])
+        for name, value in (('p50', p50), ('p95', p95), ('p99', p99)):
+            metrics.gauge(f'sound_round_cue_latency_{name}_ms').set(value)
+        logger.info("Cue latency over {} cues: p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms",
+                    cue_latency.window_length, p50, p95, p99)
+        cue_latency.reset_window()
+        self.sound_manager.sound_metrics.cue_block_delay.reset_window()
 
     def game_end(self):
         logger.info("Game end")
+        if self.enable_sound_trace:
+            trace_path = SOUND_TRACE_PATH / f"{datetime.now():%Y-%m-%d_%H-%M-%S}.trace"
+            self.sound_manager.save_trace(trace_path)
+            self.sound_manager.reset_trace()
+            logger.info("Sound trace saved to {}", trace_path)
+        if self.match_recorder:
+            match_path = self.match_recorder.record_game_end()
+            logger.info("Match recording saved to {}", match_path)
+        if self.tracer:
+            frame_trace_path = FRAME_TRACE_PATH / f"{datetime.now():%Y-%m-%d_%H-%M-%S}.json"
+            self.tracer.save(frame_trace_path)
+            logger.info("Frame trace saved to {}", frame_trace_path)
 
     def audio_sample(self) -> bytes:
-        audio_sample = self.sound_manager.sample_audio(render_size=SOUND_RENDER_SIZE)
-        return audio_sample.tobytes()
+        audio_sample = self.sound_manager.render().tobytes()
+        cost = time.perf_counter() - self.frame_start
+        self.frame_cost.observe(cost * 1000)
+        self.active_voices.set(self.sound_manager.count_voices(None))
+        if self.governor and self.governor.observe(cost):
+            self.apply_tier(self.governor.tier)
+        return audio_sample
+
+    def apply_tier(self, tier: Tier):
+        if ENABLE_LOGGING and tier < Tier.NO_LOGGING:
+            logger.enable("src")
+        logger.warning("Frame cost averaging {:.2f} ms against a {:.1f} ms budget, governor tier now {}",
+                       self.governor.average_cost * 1000, self.governor.budget * 1000, tier.name)
+        for character_handler in self.character_handlers:
+            character_handler.position_refresh_interval = (GOVERNOR_POSITION_REFRESH_INTERVAL
+                                                           if tier >= Tier.SKIP_POSITION_REFRESH else 1)
+            character_handler.set_walking_enabled(tier < Tier.NO_WALKING)
+        self.sound_manager.voice_limit = GOVERNOR_VOICE_LIMIT if tier >= Tier.VOICE_LIMIT else None
+        if tier >= Tier.NO_LOGGING:
+            logger.disable("src")
     
     def close(self):
+        # The controller closes after a game, a daemon worker also has to when the server could not be reached
+        if self.closed:
+            return
+        self.closed = True
+        if self.profiler:
+            self.profiler.finish()
+        if self.auditor:
+            self.auditor.close()
         self.sound_manager.close()
         logger.info("Close sound manager")
@@ -0,0 +1,102 @@
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from pyftg_sound.models.sound_renderer import SoundRenderer
+from pyftg_sound.openal import al, soft
+from pyftg_sound.utils.openal import set_source_attribute
+
+from src.audio_metrics import find_onset
+from src.constants import listener_orientation, listener_position, source_attrs
+from src.sound_files import decode_wav
+
+CueKey = Tuple[str, float, float, float]
+# Format, PCM and sample rate as decode_wav returns them
+DecodedSound = Tuple[int, bytes, int]
+
+
+class PrerenderedCue(NamedTuple):
+    samples: np.ndarray
+    gain: float
+    # First sample of the render at the onset threshold
+    onset: int
+
+
+class CachedVoice:
+    cue: PrerenderedCue
+    position: int
+    loop: bool
+    scale: float
+
+    def __init__(self, cue: PrerenderedCue, loop: bool, gain: float) -> None:
+        self.cue = cue
+        self.position = 0
+        self.loop = loop
+        self.scale = gain / cue.gain
+
+    def mix_into(self, block: np.ndarray) -> bool:
+        # Adds the next len(block) samples to block, returns False once a one-shot has finished
+        samples = self.cue.samples
+        written = 0
+        while written < len(block):
+            count = min(len(block) - written, len(samples) - self.position)
+            target = block[written:written + count]
+            if self.scale == 1.0:
+                np.add(target, samples[self.position:self.position + count], out=target)
+            else:
+                target += samples[self.position:self.position + count] * self.scale
+            written += count
+            self.position += count
+            if self.position == len(samples):
+                if not self.loop:
+                    return False
+                self.position = 0
+        return True
+
+
+def prerender_cues(data_path: Path, cues: List[CueKey], sample_rate: int, render_size: int,
+                   nchannels: int) -> Dict[CueKey, PrerenderedCue]:
+    # Decoded like the live buffers, so 24-bit sounds load here as well
+    sounds = {name: decode_wav(data_path / name) for name in {cue[0] for cue in cues} if (data_path / name).exists()}
+    return render_cues(sounds, cues, sample_rate, render_size, nchannels)
+
+
+def render_cues(sounds: Dict[str, DecodedSound], cues: List[CueKey], sample_rate: int, render_size: int,
+                nchannels: int) -> Dict[CueKey, PrerenderedCue]:
+    # Plays every cue once, alone, through a private loopback device with the live listener and source settings,
+    # so mixing the result later sounds the same as letting OpenAL spatialize it again
+    renderer = SoundRenderer.create_virtual_renderer(sample_rate=sample_rate)
+    renderer.al_listener_fv(al.AL_POSITION, list(listener_position))
+    renderer.al_listener_fv(al.AL_ORIENTATION, list(listener_orientation))
+    block = (al.ALfloat * (render_size * nchannels))()
+    block_array = np.frombuffer(block, dtype=np.float32).reshape(render_size, nchannels)
+    source_id = renderer.create_source(source_attrs)
+    buffers = {}
+    prerendered = {}
+    for name, x, y, gain in cues:
+        if name not in sounds:
+            continue
+        renderer.set()
+        if name not in buffers:
+            alformat, pcm, rate = sounds[name]
+            buffers[name] = renderer.create_buffer()
+            al.alBufferData(buffers[name], alformat, pcm, len(pcm), rate)
+        set_source_attribute(source_id, al.AL_GAIN, gain)
+        renderer.play2(source_id, buffers[name], x, 0, y, False)
+        blocks = []
+        while renderer.is_playing(source_id):
+            renderer.set()
+            soft.alcRenderSamplesSOFT(renderer.device, block, render_size)
+            blocks.append(block_array.copy())
+        samples = np.concatenate(blocks) if blocks else block_array[:0]
+        # The last block is padded with silence, which would otherwise end up as a gap in looping cues
+        audible = np.flatnonzero(np.any(samples != 0, axis=1))
+        if len(audible):
+            samples = samples[:audible[-1] + 1]
+            prerendered[(name, x, y, gain)] = PrerenderedCue(samples, gain, find_onset(samples, sample_rate))
+    renderer.delete_source(source_id)
+    for buffer_id in buffers.values():
+        renderer.delete_buffer(buffer_id)
+    renderer.close()
+    return prerendered
+
@@ -0,0 +1,60 @@
+from enum import IntEnum
+
+from src.config import (FRAME_BUDGET, GOVERNOR_DEGRADE_RATIO, GOVERNOR_DEGRADE_FRAMES,
+                        GOVERNOR_RECOVER_FRAMES, GOVERNOR_RECOVER_RATIO)
+from src.metrics import Counter, Gauge, metrics
+
+# Weight of the newest frame in the running average of frame cost
+COST_SMOOTHING = 0.1
+
+
+class Tier(IntEnum):
+    # Each tier keeps everything the tiers before it gave up
+    FULL = 0
+    SKIP_POSITION_REFRESH = 1
+    NO_WALKING = 2
+    VOICE_LIMIT = 3
+    NO_LOGGING = 4
+
+
+class Governor:
+    budget: float
+    tier: Tier
+    average_cost: float
+    # Consecutive frames the average has been over the degrade threshold (positive) or under the recover one
+    # (negative), restarted whenever it crosses back or the tier changes
+    run: int
+    tier_gauge: Gauge
+    tier_changes: Counter
+
+    def __init__(self, budget: float = FRAME_BUDGET) -> None:
+        self.budget = budget
+        self.tier = Tier.FULL
+        self.average_cost = 0.0
+        self.run = 0
+        self.tier_gauge = metrics.gauge('sound_governor_tier', "Degradation tier, 0 is full quality")
+        self.tier_changes = metrics.counter('sound_governor_tier_changes_total', "Governor tier changes")
+
+    def observe(self, cost: float) -> bool:
+        # Returns True when the tier changed and the caller has to apply it
+        self.average_cost += COST_SMOOTHING * (cost - self.average_cost)
+        if self.average_cost > self.budget * GOVERNOR_DEGRADE_RATIO:
+            self.run = self.run + 1 if self.run > 0 else 1
+        elif self.average_cost < self.budget * GOVERNOR_RECOVER_RATIO:
+            self.run = self.run - 1 if self.run < 0 else -1
+        else:
+            self.run = 0
+        # Steps down quickly and back up slowly, so a tier is not flipped on every other frame
+        if self.run >= GOVERNOR_DEGRADE_FRAMES and self.tier < Tier.NO_LOGGING:
+            self.set_tier(Tier(self.tier + 1))
+            return True
+        if -self.run >= GOVERNOR_RECOVER_FRAMES and self.tier > Tier.FULL:
+            self.set_tier(Tier(self.tier - 1))
+            return True
+        return False
+
+    def set_tier(self, tier: Tier) -> None:
+        self.tier = tier
+        self.run = 0
+        self.tier_gauge.set(tier)
+        self.tier_changes.inc()
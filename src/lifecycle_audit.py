@@ -0,0 +1,118 @@
+import sys
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from src import profiler, tracing
+from src.config import MEMORY_DIFF_FRAMES, MEMORY_DIFF_TOP
+from src.metrics import Gauge, metrics
+
+# Frames of the method wrappers are skipped when looking for who created a source or buffer
+wrapper_files = frozenset([__file__, tracing.__file__, profiler.__file__])
+
+
+def caller_owner() -> str:
+    frame = sys._getframe(2)
+    while frame.f_back and frame.f_code.co_filename in wrapper_files:
+        frame = frame.f_back
+    return f"{Path(frame.f_code.co_filename).stem}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+class LifecycleAuditor:
+    # Keeps the creation site of every live source and buffer and checks at round end that the sources created
+    # during the round were released
+    sound_manager: object
+    source_owners: Dict[object, str]
+    buffer_owners: Dict[object, str]
+    round_sources: Set[object]
+    snapshot: Optional[tracemalloc.Snapshot]
+    live_sources: Gauge
+    live_buffers: Gauge
+    unreleased_sources: Gauge
+
+    def __init__(self, sound_manager: object, enable_memory_diff: bool = False) -> None:
+        self.sound_manager = sound_manager
+        self.source_owners = {}
+        self.buffer_owners = {}
+        self.round_sources = set()
+        self.tracking_round = False
+        self.snapshot = None
+        self.live_sources = metrics.gauge('sound_live_sources', "OpenAL sources alive")
+        self.live_buffers = metrics.gauge('sound_live_buffers', "OpenAL buffers alive")
+        self.unreleased_sources = metrics.gauge('sound_unreleased_sources',
+                                                "Sources created during a round and still alive after it")
+        self.wrap_sound_manager()
+        if enable_memory_diff:
+            tracemalloc.start(MEMORY_DIFF_FRAMES)
+
+    def wrap_sound_manager(self) -> None:
+        create_audio_source = self.sound_manager.create_audio_source
+        remove_source = self.sound_manager.remove_source
+
+        def audited_create_audio_source(attrs: dict = {}):
+            source = create_audio_source(attrs)
+            self.source_owners[source] = caller_owner()
+            if self.tracking_round:
+                self.round_sources.add(source)
+            return source
+
+        def audited_remove_source(source) -> None:
+            self.source_owners.pop(source, None)
+            self.round_sources.discard(source)
+            remove_source(source)
+
+        self.sound_manager.create_audio_source = audited_create_audio_source
+        self.sound_manager.remove_source = audited_remove_source
+        # The render worker stand-in has no buffers of its own
+        if hasattr(self.sound_manager, 'create_audio_buffer'):
+            create_audio_buffer = self.sound_manager.create_audio_buffer
+
+            def audited_create_audio_buffer(file_path: Optional[Path] = None):
+                buffer = create_audio_buffer(file_path)
+                self.buffer_owners[buffer] = caller_owner()
+                return buffer
+
+            self.sound_manager.create_audio_buffer = audited_create_audio_buffer
+
+    def start_tracking(self) -> None:
+        # Sources created from here on belong to a round, the ones before are expected to live as long as the process
+        self.tracking_round = True
+
+    def audit_round(self) -> None:
+        # Call once the round's sources should have been stopped and removed
+        audio_buffers = getattr(self.sound_manager, 'audio_buffers', None)
+        if audio_buffers is not None:
+            for buffer in [buffer for buffer in self.buffer_owners if buffer not in audio_buffers]:
+                del self.buffer_owners[buffer]
+        self.live_sources.set(len(self.source_owners))
+        self.live_buffers.set(len(self.buffer_owners))
+        self.unreleased_sources.set(len(self.round_sources))
+        logger.info("Live sources by owner: {}", dict(Counter(self.source_owners.values())))
+        logger.info("Live buffers by owner: {}", dict(Counter(self.buffer_owners.values())))
+        if self.round_sources:
+            owners = Counter(self.source_owners[source] for source in self.round_sources)
+            logger.warning("{} sources created during the round were never released: {}",
+                           len(self.round_sources), dict(owners))
+        if tracemalloc.is_tracing():
+            self.diff_memory()
+
+    def diff_memory(self) -> None:
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        if self.snapshot is not None:
+            traced, peak = tracemalloc.get_traced_memory()
+            logger.info("Traced memory {:.1f} KiB (peak {:.1f} KiB), largest changes since the last round:",
+                        traced / 1024, peak / 1024)
+            for statistic in snapshot.compare_to(self.snapshot, 'lineno')[:MEMORY_DIFF_TOP]:
+                logger.info("  {}", statistic)
+        self.snapshot = snapshot
+
+    def close(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshot = None
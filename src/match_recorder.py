@@ -0,0 +1,59 @@
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator, Optional, Tuple, Union
+
+from pyftg.models.frame_data import FrameData
+from pyftg.models.round_result import RoundResult
+
+FRAME = "frame"
+ROUND_END = "round_end"
+GAME_END = "game_end"
+
+MatchEvent = Tuple[str, Union[FrameData, RoundResult, None]]
+
+
+class MatchRecorder:
+    directory: Path
+    file: Optional[IO[str]]
+
+    def __init__(self, directory: Path, name: Optional[str] = None) -> None:
+        self.directory = directory
+        self.name = name
+        self.file = None
+        self.path = None
+
+    def write(self, event: str, data: Optional[dict]) -> None:
+        if self.file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.path = self.directory / f"{self.name or f'{datetime.now():%Y-%m-%d_%H-%M-%S}'}.jsonl.gz"
+            self.file = gzip.open(self.path, "wt", encoding="utf-8")
+        self.file.write(json.dumps({"event": event, "data": data}, separators=(",", ":")))
+        self.file.write("\n")
+
+    def record_frame(self, frame_data: FrameData) -> None:
+        self.write(FRAME, frame_data.to_dict())
+
+    def record_round_end(self, round_result: RoundResult) -> None:
+        self.write(ROUND_END, round_result.to_dict())
+
+    def record_game_end(self) -> Optional[Path]:
+        if self.file is None:
+            return None
+        self.write(GAME_END, None)
+        self.file.close()
+        self.file = None
+        return self.path
+
+
+def load_match(path: Path) -> Iterator[MatchEvent]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["event"] == FRAME:
+                yield FRAME, FrameData.from_dict(record["data"])
+            elif record["event"] == ROUND_END:
+                yield ROUND_END, RoundResult.from_dict(record["data"])
+            else:
+                yield GAME_END, None
@@ -0,0 +1,117 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 17, 25, 33, 50, 75, 100, 150, 250]
+FRAME_COST_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16.6, 33, 66]
+# Observations kept for window percentiles, a 60 s round is 3600 frames. Older ones are overwritten
+WINDOW_CAPACITY = 4096
+
+
+def series_name(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for value in labels.values())
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+class Counter:
+    name: str
+    help: str
+    labels: Dict[str, str]
+    value: float
+
+    def __init__(self, name: str, help: str = '', labels: Optional[Dict[str, str]] = None) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    name: str
+    help: str
+    value: float
+
+    def __init__(self, name: str, help: str = '') -> None:
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    name: str
+    help: str
+    buckets: List[float]
+    bucket_counts: List[int]
+    count: int
+    sum: float
+    window: np.ndarray
+    window_length: int
+
+    def __init__(self, name: str, buckets: Sequence[float], help: str = '') -> None:
+        self.name = name
+        self.help = help
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        # Raw observations since the last reset_window, for exact percentiles over e.g. one round. Preallocated,
+        # observe runs every frame and must not allocate
+        self.window = np.zeros(WINDOW_CAPACITY)
+        self.window_length = 0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        # First bucket whose bound is not below the value, the last one counts everything above the bounds
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.window[self.window_length % WINDOW_CAPACITY] = value
+        self.window_length += 1
+
+    def percentiles(self, percentiles: Sequence[float]) -> List[float]:
+        if not self.window_length:
+            return [0.0] * len(percentiles)
+        window = self.window[:min(self.window_length, WINDOW_CAPACITY)]
+        return [float(value) for value in np.percentile(window, percentiles)]
+
+    def reset_window(self) -> None:
+        self.window_length = 0
+
+
+class MetricsRegistry:
+    counters: Dict[str, Counter]
+    gauges: Dict[str, Gauge]
+    histograms: Dict[str, Histogram]
+
+    def __init__(self) -> None:
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def counter(self, name: str, help: str = '', labels: Optional[Dict[str, str]] = None) -> Counter:
+        # Counters with labels are kept per series, e.g. one per cue
+        key = series_name(name, labels or {})
+        if key not in self.counters:
+            self.counters[key] = Counter(name, help, labels)
+        return self.counters[key]
+
+    def gauge(self, name: str, help: str = '') -> Gauge:
+        if name not in self.gauges:
+            self.gauges[name] = Gauge(name, help)
+        return self.gauges[name]
+
+    def histogram(self, name: str, buckets: Sequence[float], help: str = '') -> Histogram:
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, buckets, help)
+        return self.histograms[name]
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,107 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from src.config import METRICS_HOST, METRICS_PORT
+from src.metrics import Counter, MetricsRegistry, metrics, series_name
+
+# Percentiles of the current round's observations, exported next to each histogram's cumulative buckets
+ROUND_QUANTILES = [0.5, 0.95, 0.99]
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return str(int(value)) if value == int(value) else repr(float(value))
+
+
+def render_metrics(registry: MetricsRegistry) -> str:
+    # Prometheus text exposition format 0.0.4. Copies are taken first, the frame loop keeps registering series
+    lines: List[str] = []
+    # All series of a name must follow its TYPE line, labelled counters are registered as cues are first played
+    families: Dict[str, List[Counter]] = {}
+    for counter in list(registry.counters.values()):
+        families.setdefault(counter.name, []).append(counter)
+    for name, counters in families.items():
+        lines.append(f"# HELP {name} {counters[0].help}")
+        lines.append(f"# TYPE {name} counter")
+        for counter in counters:
+            lines.append(f"{series_name(counter.name, counter.labels)} {format_value(counter.value)}")
+    for gauge in list(registry.gauges.values()):
+        lines.append(f"# HELP {gauge.name} {gauge.help}")
+        lines.append(f"# TYPE {gauge.name} gauge")
+        lines.append(f"{gauge.name} {format_value(gauge.value)}")
+    for histogram in list(registry.histograms.values()):
+        lines.append(f"# HELP {histogram.name} {histogram.help}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + [float('inf')], list(histogram.bucket_counts)):
+            cumulative += count
+            lines.append(f'{histogram.name}_bucket{{le="{format_value(bound)}"}} {cumulative}')
+        lines.append(f"{histogram.name}_sum {format_value(histogram.sum)}")
+        lines.append(f"{histogram.name}_count {histogram.count}")
+        name = f"{histogram.name}_round"
+        lines.append(f"# HELP {name} {histogram.help}, percentiles over the current round")
+        lines.append(f"# TYPE {name} gauge")
+        quantiles = histogram.percentiles([quantile * 100 for quantile in ROUND_QUANTILES])
+        for quantile, value in zip(ROUND_QUANTILES, quantiles):
+            lines.append(f'{name}{{quantile="{quantile}"}} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self) -> None:
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render_metrics(self.registry).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes every few seconds would otherwise fill stderr
+        pass
+
+
+class MetricsServer:
+    # Serves the registry at http://host:port/metrics from a daemon thread, outside the frame loop
+    host: str
+    port: int
+    server: Optional[ThreadingHTTPServer]
+    thread: Optional[threading.Thread]
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self) -> bool:
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        except OSError as e:
+            # Another sound AI on the host may hold the port, the game does not depend on the endpoint
+            logger.warning("Metrics endpoint not started on {}:{}: {}", self.host, self.port, e)
+            return False
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        logger.info("Serving metrics at http://{}:{}/metrics", self.host, self.server.server_address[1])
+        return True
+
+    def close(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
@@ -0,0 +1,80 @@
+import ctypes
+from typing import List
+
+import numpy as np
+from pyftg_sound.models.sound_renderer import SoundRenderer
+from pyftg_sound.openal import al
+
+from src.config import OUTPUT_QUEUE_BLOCKS
+from src.metrics import Counter, Gauge, metrics
+
+
+class OutputStream:
+    renderer: SoundRenderer
+    source_id: int
+    buffer_ids: List[int]
+    free_buffers: List[int]
+    dropped_blocks: Counter
+    underruns: Counter
+    queued_blocks: Gauge
+
+    def __init__(self, renderer: SoundRenderer, render_size: int, nchannels: int, sample_rate: int,
+                 queue_blocks: int = OUTPUT_QUEUE_BLOCKS) -> None:
+        self.renderer = renderer
+        self.sample_rate = sample_rate
+        self.format = al.AL_FORMAT_STEREO16 if nchannels == 2 else al.AL_FORMAT_MONO16
+        self.source_id = renderer.create_source({})
+        buffers = (al.ALuint * queue_blocks)()
+        renderer.set()
+        al.alGenBuffers(queue_blocks, buffers)
+        self.buffer_ids = list(buffers)
+        self.free_buffers = list(buffers)
+        self.dropped_blocks = metrics.counter('sound_output_dropped_blocks_total',
+                                              "Blocks dropped because the device queue was full")
+        self.underruns = metrics.counter('sound_output_underruns_total', "Times the device played out its whole queue")
+        self.queued_blocks = metrics.gauge('sound_output_queued_blocks', "Blocks queued on the audio device")
+        self.started = False
+
+        self.state = al.ALint(0)
+        self.processed = al.ALint(0)
+        self.buffer = al.ALuint(0)
+        self.scratch = np.empty((render_size, nchannels), dtype=np.float32)
+        self.samples = (al.ALshort * (render_size * nchannels))()
+        self.sample_array = np.frombuffer(self.samples, dtype=np.int16).reshape(render_size, nchannels)
+        self.samples_size = ctypes.sizeof(self.samples)
+
+    def write(self, block: np.ndarray) -> None:
+        # Queues an already mixed block on the device, the device only resamples it
+        self.renderer.set()
+        al.alGetSourcei(self.source_id, al.AL_BUFFERS_PROCESSED, self.processed)
+        for _ in range(self.processed.value):
+            al.alSourceUnqueueBuffers(self.source_id, 1, self.buffer)
+            self.free_buffers.append(self.buffer.value)
+        if not self.free_buffers:
+            # The device is behind the game, dropping the block keeps the monitor latency bounded
+            self.dropped_blocks.inc()
+            return
+
+        np.multiply(block, 32767, out=self.scratch)
+        np.clip(self.scratch, -32768, 32767, out=self.scratch)
+        self.sample_array[...] = self.scratch
+        self.buffer.value = self.free_buffers.pop()
+        al.alBufferData(self.buffer, self.format, self.samples, self.samples_size, self.sample_rate)
+        al.alSourceQueueBuffers(self.source_id, 1, self.buffer)
+        self.queued_blocks.set(len(self.buffer_ids) - len(self.free_buffers))
+        al.alGetSourcei(self.source_id, al.AL_SOURCE_STATE, self.state)
+        if self.state.value != al.AL_PLAYING:
+            # First block or the queue ran dry while the game was paused
+            if self.started:
+                self.underruns.inc()
+            self.started = True
+            al.alSourcePlay(self.source_id)
+
+    def close(self) -> None:
+        self.renderer.set()
+        al.alSourceStop(self.source_id)
+        al.alSourcei(self.source_id, al.AL_BUFFER, al.AL_NONE)
+        self.renderer.delete_source(self.source_id)
+        for buffer_id in self.buffer_ids:
+            self.renderer.delete_buffer(buffer_id)
+        self.renderer.close()
@@ -0,0 +1,68 @@
+import cProfile
+import signal
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from loguru import logger
+
+from src.config import PROFILE_DURATION, PROFILE_PATH
+
+
+class SignalProfiler:
+    # `kill -USR1 <pid>` profiles the frame loop for duration seconds and writes a pstats file to path
+    duration: float
+    path: Path
+    profile: Optional[cProfile.Profile]
+    deadline: float
+    started: bool
+
+    def __init__(self, duration: float = PROFILE_DURATION, path: Path = PROFILE_PATH) -> None:
+        self.duration = duration
+        self.path = path
+        self.profile = None
+        self.deadline = 0.0
+        self.started = False
+
+    def install(self) -> bool:
+        # Must be called from the main thread, Windows has no SIGUSR1
+        if not hasattr(signal, "SIGUSR1"):
+            return False
+        signal.signal(signal.SIGUSR1, self.request)
+        return True
+
+    def request(self, signum: int, frame) -> None:
+        # Runs between two bytecodes of the main thread, so only flags the capture and leaves logging to the frame loop
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.deadline = time.monotonic() + self.duration
+
+    def wrap(self, function: Callable) -> Callable:
+        def profiled(*args, **kwargs):
+            profile = self.profile
+            if profile is None:
+                return function(*args, **kwargs)
+            if not self.started:
+                self.started = True
+                logger.info("Profiling the frame loop for {:.0f} s", self.duration)
+            elif time.monotonic() >= self.deadline:
+                self.finish()
+                return function(*args, **kwargs)
+            # cProfile only sees the thread it is enabled in, and processing runs on an executor thread
+            return profile.runcall(function, *args, **kwargs)
+        return profiled
+
+    def instrument(self, target: object, names: Iterable[str]) -> None:
+        for name in names:
+            setattr(target, name, self.wrap(getattr(target, name)))
+
+    def finish(self) -> None:
+        if self.profile is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        profile_path = self.path / f"{datetime.now():%Y-%m-%d_%H-%M-%S}.pstats"
+        self.profile.dump_stats(profile_path)
+        self.profile = None
+        self.started = False
+        logger.info("Profile saved to {}, open it with `python -m pstats` or snakeviz", profile_path)
@@ -0,0 +1,439 @@
+import multiprocessing
+import time
+import wave
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+from loguru import logger
+from pyftg_sound.models.audio_source import AudioSource
+
+from src.config import (ENABLE_AUDIO_OUTPUT, ENABLE_HOT_RELOAD, RENDER_WORKER_BLOCK_SLOTS, RENDER_WORKER_COMMAND_SLOTS,
+                        SOUND_DATA_PATH, SOUND_RENDER_SIZE, SOUND_SAMPLE_RATE)
+from src.constants import priority_sound_names, source_attrs
+from src.metrics import Counter, Gauge, metrics
+from src.sound_manager import LOOPING_END_SAMPLE, SoundManager, SoundMetrics, VoiceTracker
+from src.sound_trace import (NO_BUFFER, OP_CREATE_SOURCE, OP_PLAY, OP_REMOVE_SOURCE, OP_SET_GAIN, OP_SET_POS,
+                             OP_STOP)
+
+OP_BEGIN_FRAME = 6
+OP_RENDER = 7
+OP_STOP_ALL = 8
+OP_ROUND_END = 9
+OP_CLOSE = 10
+
+# Cue onsets the worker can report with one block, further ones in the same block go unobserved
+BLOCK_ONSET_SLOTS = 32
+
+# Polls of an empty ring before the waiting side starts to sleep between polls
+SPIN_POLLS = 200
+POLL_INTERVAL = 50e-6
+
+# The frame number rides in source for OP_BEGIN_FRAME, gain in x for OP_SET_GAIN
+command_dtype = np.dtype([('op', np.uint8), ('loop', np.uint8), ('buffer', np.uint16), ('source', np.uint32),
+                          ('x', np.float32), ('y', np.float32), ('z', np.float32)])
+# Producer and consumer indices live on separate cache lines
+INDEX_STRIDE = 8
+
+
+class CommandRing:
+    # Single-producer single-consumer queue, each side only ever writes its own index
+    slots: np.ndarray
+    indices: np.ndarray
+    # Called by push while the ring stays full, raises once the consumer is gone
+    check_consumer: Optional[Callable[[], None]]
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int) -> None:
+        self.shm = shm
+        self.capacity = capacity
+        self.check_consumer = None
+        self.indices = np.ndarray((2 * INDEX_STRIDE,), dtype=np.uint64, buffer=shm.buf)
+        self.slots = np.ndarray((capacity,), dtype=command_dtype, buffer=shm.buf, offset=self.indices.nbytes)
+
+    @staticmethod
+    def size(capacity: int) -> int:
+        return 2 * INDEX_STRIDE * 8 + capacity * command_dtype.itemsize
+
+    def push(self, op: int, source: int = 0, buffer: int = NO_BUFFER, loop: bool = False,
+             x: float = 0, y: float = 0, z: float = 0) -> None:
+        tail = int(self.indices[INDEX_STRIDE])
+        polls = 0
+        while tail - int(self.indices[0]) >= self.capacity:
+            polls += 1
+            if polls > SPIN_POLLS and self.check_consumer:
+                self.check_consumer()
+            time.sleep(POLL_INTERVAL if polls > SPIN_POLLS else 0)
+        self.slots[tail % self.capacity] = (op, loop, buffer, source, x, y, z)
+        # Published only once the slot is written
+        self.indices[INDEX_STRIDE] = tail + 1
+
+    def pop(self) -> Iterator[np.void]:
+        # Each command stays valid until the next one is taken
+        head = int(self.indices[0])
+        while head < int(self.indices[INDEX_STRIDE]):
+            yield self.slots[head % self.capacity]
+            head += 1
+            self.indices[0] = head
+
+    def close(self) -> None:
+        # The views have to go before the mapping can be closed
+        self.slots = None
+        self.indices = None
+        self.shm.close()
+
+
+class BlockRing:
+    # Rendered blocks, written by the worker and read in place by audio_sample. Each block carries the delays of the
+    # cue onsets the worker observed while mixing it
+    blocks: np.ndarray
+    counter: np.ndarray
+    onset_counts: np.ndarray
+    onset_delays: np.ndarray
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, render_size: int, nchannels: int) -> None:
+        self.shm = shm
+        self.counter = np.ndarray((INDEX_STRIDE,), dtype=np.uint64, buffer=shm.buf)
+        self.slots = slots
+        self.blocks = np.ndarray((slots, render_size, nchannels), dtype=np.float32, buffer=shm.buf,
+                                 offset=self.counter.nbytes)
+        self.onset_counts = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf,
+                                       offset=self.counter.nbytes + self.blocks.nbytes)
+        self.onset_delays = np.ndarray((slots, BLOCK_ONSET_SLOTS), dtype=np.int64, buffer=shm.buf,
+                                       offset=self.counter.nbytes + self.blocks.nbytes + self.onset_counts.nbytes)
+
+    @staticmethod
+    def size(slots: int, render_size: int, nchannels: int) -> int:
+        return INDEX_STRIDE * 8 + slots * (render_size * nchannels * 4 + (1 + BLOCK_ONSET_SLOTS) * 8)
+
+    def write(self, block: np.ndarray, onset_delays: List[int]) -> None:
+        written = int(self.counter[0])
+        slot = written % self.slots
+        self.blocks[slot] = block
+        count = min(len(onset_delays), BLOCK_ONSET_SLOTS)
+        self.onset_delays[slot, :count] = onset_delays[:count]
+        self.onset_counts[slot] = count
+        self.counter[0] = written + 1
+
+    def close(self) -> None:
+        self.blocks = None
+        self.counter = None
+        self.onset_counts = None
+        self.onset_delays = None
+        self.shm.close()
+
+
+class SoundDurations:
+    # Length of every sound in render clock samples, indexed like sound_names. Written by the worker, which decodes
+    # the sounds and replaces them on hot reload, read by the frame loop for is_playing and the voice count
+    values: np.ndarray
+
+    def __init__(self, shm: shared_memory.SharedMemory, count: int) -> None:
+        self.shm = shm
+        self.values = np.ndarray((count,), dtype=np.int64, buffer=shm.buf)
+
+    @staticmethod
+    def size(count: int) -> int:
+        # A shared memory segment cannot be empty
+        return max(count, 1) * 8
+
+    def close(self) -> None:
+        self.values = None
+        self.shm.close()
+
+
+class WorkerSoundManager(SoundManager):
+    # Mixes in the worker. Cue onsets are handed back with the block they were observed in, the frame loop owns the
+    # metrics that are served and reported
+    block_onsets: List[int]
+
+    def __init__(self, render_size: int = SOUND_RENDER_SIZE, nchannels: int = 2) -> None:
+        super().__init__(render_size=render_size, nchannels=nchannels)
+        self.block_onsets = []
+
+    def observe_cue_onset(self, delay: int) -> None:
+        self.block_onsets.append(delay)
+
+
+def publish_durations(sound_manager: SoundManager, durations: SoundDurations, sound_names: List[str]) -> None:
+    for index, name in enumerate(sound_names):
+        buffer = sound_manager.get_sound_buffer(name)
+        if buffer is not None:
+            durations.values[index] = buffer.duration
+
+
+def apply_command(sound_manager: SoundManager, command: np.void, sound_names: List[str],
+                  sources: Dict[int, AudioSource]) -> None:
+    op = command['op']
+    if op == OP_CREATE_SOURCE:
+        sources[int(command['source'])] = sound_manager.create_audio_source(source_attrs)
+    elif op == OP_REMOVE_SOURCE:
+        sound_manager.remove_source(sources.pop(int(command['source'])))
+    elif op == OP_PLAY:
+        # Looked up by name every time, hot reload can swap the buffer behind a name
+        buffer = sound_manager.get_sound_buffer(sound_names[command['buffer']])
+        sound_manager.play3d(sources[int(command['source'])], buffer, float(command['x']), float(command['y']),
+                             float(command['z']), bool(command['loop']))
+    elif op == OP_STOP:
+        sound_manager.stop(sources[int(command['source'])])
+    elif op == OP_SET_POS:
+        sound_manager.set_source_pos3d(sources[int(command['source'])], float(command['x']), float(command['y']),
+                                       float(command['z']))
+    elif op == OP_SET_GAIN:
+        sound_manager.set_source_gain(sources[int(command['source'])], float(command['x']))
+    elif op == OP_BEGIN_FRAME:
+        sound_manager.begin_frame(int(command['source']))
+    elif op == OP_STOP_ALL:
+        sound_manager.stop_all()
+    elif op == OP_ROUND_END:
+        sound_manager.release_retired_buffers()
+
+
+def serve_commands(sound_manager: WorkerSoundManager, commands: CommandRing, blocks: BlockRing,
+                   durations: SoundDurations, sound_names: List[str]) -> None:
+    sources: Dict[int, AudioSource] = {}
+    reloads = sound_manager.reloads
+    polls = 0
+    while True:
+        idle = True
+        for command in commands.pop():
+            idle = False
+            if command['op'] == OP_RENDER:
+                blocks.write(sound_manager.render(), sound_manager.block_onsets)
+                sound_manager.block_onsets.clear()
+            elif command['op'] == OP_CLOSE:
+                return
+            else:
+                apply_command(sound_manager, command, sound_names, sources)
+                # Reloads are applied in begin_frame, plays from the frame already queued keep the old length
+                if sound_manager.reloads != reloads:
+                    reloads = sound_manager.reloads
+                    publish_durations(sound_manager, durations, sound_names)
+        polls = polls + 1 if idle else 0
+        if polls > SPIN_POLLS:
+            time.sleep(POLL_INTERVAL)
+
+
+def run_render_worker(command_name: str, block_name: str, durations_name: str, command_slots: int, block_slots: int,
+                      render_size: int, nchannels: int, sample_rate: int, enable_audio_output: bool, data_path: Path,
+                      sound_names: List[str]) -> None:
+    # A spawned worker shares the resource tracker of the process that created the segments and unlinks them
+    commands = CommandRing(shared_memory.SharedMemory(name=command_name), command_slots)
+    blocks = BlockRing(shared_memory.SharedMemory(name=block_name), block_slots, render_size, nchannels)
+    durations = SoundDurations(shared_memory.SharedMemory(name=durations_name), len(sound_names))
+    sound_manager = WorkerSoundManager(render_size=render_size, nchannels=nchannels)
+    sound_manager.initialize(sample_rate=sample_rate, enable_audio_output=enable_audio_output)
+    sound_manager.load_sounds(data_path)
+    publish_durations(sound_manager, durations, sound_names)
+    if ENABLE_HOT_RELOAD:
+        sound_manager.start_hot_reload(data_path)
+    serve_commands(sound_manager, commands, blocks, durations, sound_names)
+    sound_manager.close()
+    commands.close()
+    blocks.close()
+    durations.close()
+
+
+class RenderWorkerSoundManager:
+    # Stands in for SoundManager in the frame loop and forwards every command to the render worker process.
+    # is_playing is answered from the render clock and the sounds' lengths, like SoundManager does.
+    # Pipelined: render asks the worker for this frame's block and returns the previous one, so the worker mixes
+    # while the next frame is handled and the output runs one block behind the in-process SoundManager
+    render_size: int
+    nchannels: int
+    sample_rate: int
+    rendered_blocks: int
+    rendered_samples: int
+    current_frame_number: int
+    sound_indices: Dict[str, int]
+    sound_names: List[str]
+    durations: Optional[SoundDurations]
+    source_end_samples: Dict[int, int]
+    voices: VoiceTracker
+    sources: Set[int]
+    voice_limit: Optional[int]
+    priority_buffers: Set[int]
+    sound_metrics: SoundMetrics
+    silence: np.ndarray
+    underruns: Counter
+    command_depth: Gauge
+
+    def __init__(self, render_size: int = SOUND_RENDER_SIZE, nchannels: int = 2) -> None:
+        self.render_size = render_size
+        self.nchannels = nchannels
+        self.sample_rate = SOUND_SAMPLE_RATE
+        self.rendered_blocks = 0
+        self.rendered_samples = 0
+        self.current_frame_number = -1
+        self.sound_indices = {}
+        self.sound_names = []
+        self.durations = None
+        self.source_end_samples = {}
+        self.voices = VoiceTracker()
+        self.sources = set()
+        self.next_source = 0
+        self.voice_limit = None
+        self.priority_buffers = set()
+        self.sound_metrics = SoundMetrics()
+        # Returned by the first render, before the worker has finished a block
+        self.silence = np.zeros((render_size, nchannels), dtype=np.float32)
+        self.underruns = metrics.counter('sound_render_underruns_total',
+                                         "Blocks the render worker had not finished when audio_sample returned them")
+        self.command_depth = metrics.gauge('sound_render_worker_commands', "Commands queued for the render worker")
+        self.process = None
+        self.commands = None
+        self.blocks = None
+
+    def initialize(self, sample_rate: int = SOUND_SAMPLE_RATE, enable_audio_output: bool = ENABLE_AUDIO_OUTPUT,
+                   command_slots: int = RENDER_WORKER_COMMAND_SLOTS, block_slots: int = RENDER_WORKER_BLOCK_SLOTS) -> None:
+        self.sample_rate = sample_rate
+        self.enable_audio_output = enable_audio_output
+        self.commands = CommandRing(shared_memory.SharedMemory(create=True, size=CommandRing.size(command_slots)),
+                                    command_slots)
+        self.blocks = BlockRing(shared_memory.SharedMemory(
+            create=True, size=BlockRing.size(block_slots, self.render_size, self.nchannels)),
+            block_slots, self.render_size, self.nchannels)
+
+    def load_sounds(self, data_path: Path = SOUND_DATA_PATH) -> None:
+        # Only the headers are read here, the worker decodes and mixes the sounds
+        files = sorted(data_path.glob('*.wav'))
+        self.durations = SoundDurations(shared_memory.SharedMemory(create=True, size=SoundDurations.size(len(files))),
+                                        len(files))
+        sound_names = self.sound_names
+        for file in files:
+            with wave.open(str(file), 'rb') as wavefp:
+                frames, rate = wavefp.getnframes(), wavefp.getframerate()
+            # Until the worker has decoded the sounds and publishes their lengths
+            self.durations.values[len(sound_names)] = -(-frames * self.sample_rate // rate)
+            self.sound_indices[file.name] = len(sound_names)
+            sound_names.append(file.name)
+        self.sound_metrics.register_cues(sound_names)
+        self.priority_buffers = {self.sound_indices[name] for name in priority_sound_names if name in self.sound_indices}
+        # spawn, OpenAL state must not be inherited through fork
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(
+            target=run_render_worker, name="render-worker", daemon=True,
+            args=(self.commands.shm.name, self.blocks.shm.name, self.durations.shm.name, self.commands.capacity,
+                  self.blocks.slots,
+                  self.render_size, self.nchannels, self.sample_rate, self.enable_audio_output, data_path,
+                  sound_names))
+        self.process.start()
+        self.commands.check_consumer = self.check_worker
+        logger.info("Render worker started as process {}", self.process.pid)
+
+    def start_hot_reload(self, data_path: Path) -> None:
+        # The worker watches the sounds itself when ENABLE_HOT_RELOAD is set
+        pass
+
+    def get_sound_buffer(self, sound_name: str) -> Optional[int]:
+        return self.sound_indices.get(sound_name)
+
+    def create_audio_source(self, attrs: dict = {}) -> int:
+        # The worker creates its sources with constants.source_attrs, the only attributes the handlers use
+        source = self.next_source
+        self.next_source += 1
+        self.sources.add(source)
+        self.commands.push(OP_CREATE_SOURCE, source)
+        return source
+
+    def remove_source(self, source: int) -> None:
+        self.sources.discard(source)
+        self.source_end_samples.pop(source, None)
+        self.voices.stop(source)
+        self.commands.push(OP_REMOVE_SOURCE, source)
+
+    def is_playing(self, source: int) -> bool:
+        return self.rendered_samples < self.source_end_samples.get(source, 0)
+
+    def count_voices(self, exclude: Optional[int] = None) -> int:
+        return self.voices.count(exclude)
+
+    def play(self, source: int, buffer: int, x: float, y: float, loop: bool) -> None:
+        self.play3d(source, buffer, x, 0, y, loop)
+
+    def play3d(self, source: int, buffer: int, x: float, y: float, z: float, loop: bool) -> None:
+        if (self.voice_limit is not None and buffer not in self.priority_buffers
+                and self.count_voices(source) >= self.voice_limit):
+            self.sound_metrics.dropped_voices.inc()
+            return
+        self.sound_metrics.plays.inc()
+        self.sound_metrics.count_cue(self.sound_names[buffer])
+        self.source_end_samples[source] = (LOOPING_END_SAMPLE if loop
+                                           else self.rendered_samples + int(self.durations.values[buffer]))
+        self.voices.start(source, self.source_end_samples[source])
+        self.commands.push(OP_PLAY, source, buffer, loop, x, y, z)
+
+    def stop(self, source: int) -> None:
+        if self.source_end_samples.pop(source, None) is None:
+            return
+        self.voices.stop(source)
+        self.sound_metrics.stops.inc()
+        self.commands.push(OP_STOP, source)
+
+    def stop_all(self) -> None:
+        self.sound_metrics.stops.inc(len(self.source_end_samples))
+        self.source_end_samples.clear()
+        self.voices.clear()
+        self.commands.push(OP_STOP_ALL)
+
+    def set_source_pos(self, source: int, x: float, y: float) -> None:
+        self.set_source_pos3d(source, x, 0, y)
+
+    def set_source_pos3d(self, source: int, x: float, y: float, z: float) -> None:
+        self.commands.push(OP_SET_POS, source, x=x, y=y, z=z)
+
+    def set_source_gain(self, source: int, gain: float) -> None:
+        self.commands.push(OP_SET_GAIN, source, x=gain)
+
+    def release_retired_buffers(self) -> None:
+        self.commands.push(OP_ROUND_END)
+
+    def begin_frame(self, frame_number: int) -> None:
+        self.current_frame_number = frame_number
+        self.commands.push(OP_BEGIN_FRAME, frame_number)
+
+    def render(self) -> np.ndarray:
+        # The returned view into shared memory is overwritten once the worker has gone around the ring.
+        # The render clock counts the blocks asked for, the worker mixes the frame's commands into that block
+        self.commands.push(OP_RENDER)
+        self.command_depth.set(int(self.commands.indices[INDEX_STRIDE]) - int(self.commands.indices[0]))
+        self.rendered_blocks += 1
+        self.rendered_samples += self.render_size
+        self.voices.advance(self.rendered_samples)
+        previous = self.rendered_blocks - 2
+        if previous < 0:
+            return self.silence
+        if int(self.blocks.counter[0]) <= previous:
+            # The worker has had the whole frame for the previous block and is still mixing it
+            self.underruns.inc()
+            polls = 0
+            while int(self.blocks.counter[0]) <= previous:
+                polls += 1
+                if polls > SPIN_POLLS:
+                    self.check_worker()
+                    time.sleep(POLL_INTERVAL)
+        slot = previous % self.blocks.slots
+        # Played a block later than the worker rendered it
+        for delay in self.blocks.onset_delays[slot, :self.blocks.onset_counts[slot]]:
+            self.sound_metrics.observe_cue(int(delay) + self.render_size, self.sample_rate, self.render_size)
+        return self.blocks.blocks[slot]
+
+    def check_worker(self) -> None:
+        if not self.process.is_alive():
+            raise RuntimeError(f"Render worker exited with code {self.process.exitcode}")
+
+    def close(self) -> None:
+        if self.process:
+            if self.process.is_alive():
+                self.commands.push(OP_CLOSE)
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        for ring in (self.commands, self.blocks, self.durations):
+            if ring:
+                ring.close()
+                ring.shm.unlink()
+        self.commands = None
+        self.blocks = None
+        self.durations = None
@@ -0,0 +1,41 @@
+import hashlib
+import struct
+import wave
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+from pyftg_sound.openal import al
+from pyftg_sound.utils.wave import formatmap
+
+from src.audio_metrics import find_onset, pcm_to_float
+
+format_frame_sizes = {al.AL_FORMAT_MONO8: 1, al.AL_FORMAT_STEREO8: 2, al.AL_FORMAT_MONO16: 2, al.AL_FORMAT_STEREO16: 4}
+# OpenAL format to (channels, bytes per sample)
+format_layouts = {alformat: (channels, bits // 8) for (channels, bits), alformat in formatmap.items()}
+
+
+def decode_wav(file: Path) -> Tuple[int, bytes, int]:
+    with wave.open(str(file), 'rb') as wavefp:
+        channels = wavefp.getnchannels()
+        sample_width = wavefp.getsampwidth()
+        sample_rate = wavefp.getframerate()
+        pcm = wavefp.readframes(wavefp.getnframes())
+    if sample_width > 2:
+        # OpenAL has no 24/32-bit integer formats, keep the top 16 bits instead of widening to float
+        samples = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, sample_width)
+        pcm = np.ascontiguousarray(samples[:, -2:]).tobytes()
+        sample_width = 2
+    return formatmap[(channels, sample_width * 8)], pcm, sample_rate
+
+
+def measure_sound(alformat: int, pcm: bytes, sample_rate: int, clock_rate: int) -> Tuple[int, int]:
+    # Length and pre-roll in samples of the render clock, OpenAL resamples every sound to the device rate
+    frames = len(pcm) // format_frame_sizes[alformat]
+    channels, sample_width = format_layouts[alformat]
+    onset = find_onset(pcm_to_float(pcm, sample_width, channels), sample_rate)
+    return -(-frames * clock_rate // sample_rate), onset * clock_rate // sample_rate
+
+
+def content_key(alformat: int, pcm: bytes, sample_rate: int) -> bytes:
+    return hashlib.sha256(struct.pack('<II', alformat, sample_rate) + pcm).digest()
@@ -0,0 +1,450 @@
+import heapq
+import sys
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+from pyftg_sound.models.audio_buffer import AudioBuffer
+from pyftg_sound.models.audio_source import AudioSource
+from pyftg_sound.models.sound_renderer import SoundRenderer
+from pyftg_sound.openal import al, alc, soft
+from pyftg_sound.sound_manager import SoundManager as BaseSoundManager
+
+from src.asset_watcher import AssetWatcher, ChangedSound
+from src.config import (ENABLE_OUTPUT_FAN_OUT, ENABLE_PRERENDERED_CUES, PLAYBACK_CHECK_INTERVAL, SOUND_RENDER_SIZE,
+                        SOUND_SAMPLE_RATE)
+from src.constants import listener_orientation, listener_position, prerendered_cues, priority_sound_names
+from src.cue_cache import CachedVoice, PrerenderedCue, prerender_cues, render_cues
+from src.metrics import LATENCY_BUCKETS_MS, Counter, Histogram, metrics
+from src.output_stream import OutputStream
+from src.sound_files import content_key, decode_wav, measure_sound
+
+LOOPING_END_SAMPLE = sys.maxsize
+
+
+class SoundMetrics:
+    # Registered by SoundManager and by RenderWorkerSoundManager alike, so the series do not depend on the mode
+    plays: Counter
+    stops: Counter
+    dropped_voices: Counter
+    cue_latency: Histogram
+    cue_block_delay: Histogram
+    cue_counters: Dict[str, Counter]
+
+    def __init__(self) -> None:
+        self.plays = metrics.counter('sound_plays_total', "Sounds started")
+        self.stops = metrics.counter('sound_stops_total', "Sounds stopped")
+        self.dropped_voices = metrics.counter('sound_dropped_voices_total', "Cues not played because of the voice limit")
+        self.cue_latency = metrics.histogram('sound_cue_latency_ms', LATENCY_BUCKETS_MS,
+                                             "Frame that triggered a cue to its first audible sample")
+        self.cue_block_delay = metrics.histogram('sound_cue_block_delay', range(8),
+                                                 "audio_sample blocks between the triggering frame and the onset")
+        self.cue_counters = {}
+
+    def register_cues(self, names: Iterable[str]) -> None:
+        # Every series exists from the start, so counting a cue never registers one mid-game
+        for name in names:
+            self.count_cue(name, 0)
+
+    def count_cue(self, name: str, amount: int = 1) -> None:
+        # Under the sound name the handler asked for, even when identical files share a buffer
+        counter = self.cue_counters.get(name)
+        if counter is None:
+            counter = self.cue_counters[name] = metrics.counter('sound_cues_total', "Sounds started per cue",
+                                                                {'cue': name})
+        counter.inc(amount)
+
+    def observe_cue(self, delay: int, sample_rate: int, render_size: int) -> None:
+        # delay counts samples from the start of the triggering frame's block to the onset
+        self.cue_latency.observe(delay * 1000 / sample_rate)
+        self.cue_block_delay.observe(delay // render_size)
+
+
+class VoiceTracker:
+    # Sources still sounding by the render clock. Kept up to date as sources start, stop and run out, so counting
+    # the voices every frame allocates nothing
+    ends: Dict[Hashable, int]
+    # (end sample, serial, source), entries of sources restarted or stopped since are skipped when they come up
+    expiries: List[Tuple[int, int, Hashable]]
+    serial: int
+
+    def __init__(self) -> None:
+        self.ends = {}
+        self.expiries = []
+        self.serial = 0
+
+    def start(self, source: Hashable, end_sample: int) -> None:
+        self.ends[source] = end_sample
+        if end_sample != LOOPING_END_SAMPLE:
+            self.serial += 1
+            heapq.heappush(self.expiries, (end_sample, self.serial, source))
+
+    def stop(self, source: Hashable) -> None:
+        self.ends.pop(source, None)
+
+    def clear(self) -> None:
+        self.ends.clear()
+        self.expiries.clear()
+
+    def advance(self, rendered_samples: int) -> None:
+        while self.expiries and self.expiries[0][0] <= rendered_samples:
+            end_sample, _, source = heapq.heappop(self.expiries)
+            if self.ends.get(source) == end_sample:
+                del self.ends[source]
+
+    def count(self, exclude: Optional[Hashable] = None) -> int:
+        return len(self.ends) - (exclude in self.ends)
+
+
+class SoundBuffer(AudioBuffer):
+    # What get_sound_buffer hands out, one per sound name. Files that decode to the same PCM share the OpenAL buffers
+    # of shared, cues are still counted, traced and cached under the name the handler asked for
+    name: str
+    shared: AudioBuffer
+    # Rate of the PCM, OpenAL reports playback positions in its samples
+    sample_rate: int
+    # Length and pre-roll in samples of the render clock
+    duration: int
+    onset: int
+
+    def __init__(self, name: str, shared: AudioBuffer, sample_rate: int, duration: int, onset: int) -> None:
+        super().__init__(shared.contexts, shared.buffers)
+        self.name = name
+        self.shared = shared
+        self.sample_rate = sample_rate
+        self.duration = duration
+        self.onset = onset
+
+
+class SoundManager(BaseSoundManager):
+    render_size: int
+    nchannels: int
+    sample_rate: int
+    rendered_blocks: int
+    rendered_samples: int
+    current_frame_number: int
+    output_stream: Optional[OutputStream]
+    # False while a device renderer mixes the sources itself, cues mixed from renders would only reach the virtual one
+    mixes_every_output: bool
+    asset_watcher: Optional[AssetWatcher]
+    retired_buffers: List[AudioBuffer]
+    reloads: int
+    sound_buffers: Dict[str, SoundBuffer]
+    source_end_samples: Dict[AudioSource, int]
+    voices: VoiceTracker
+    playback_mismatches: int
+    frame_sample: int
+    source_gains: Dict[AudioSource, float]
+    prerendered_cues: Dict[Tuple[SoundBuffer, float, float, float, float], PrerenderedCue]
+    cached_voices: Dict[AudioSource, CachedVoice]
+    # Voices whose onset has not been rendered yet, with the first sample of the block of the frame that started them
+    pending_onsets: Dict[AudioSource, Tuple[int, SoundBuffer]]
+    source_offset: al.ALint
+    source_position: al.ALfloat * 3
+    voice_limit: Optional[int]
+    priority_buffers: Set[SoundBuffer]
+    sound_metrics: SoundMetrics
+
+    def __init__(self, render_size: int = SOUND_RENDER_SIZE, nchannels: int = 2) -> None:
+        super().__init__()
+        # pyftg_sound declares these as class attributes, so every manager in the process would share them
+        self.sound_renderers = []
+        self.audio_sources = []
+        self.audio_buffers = []
+        self.sound_buffers = {}
+        self.virtual_renderer = None
+
+        self.render_size = render_size
+        self.nchannels = nchannels
+        self.sample_rate = SOUND_SAMPLE_RATE
+        self.rendered_blocks = 0
+        self.rendered_samples = 0
+        self.current_frame_number = -1
+        self.output_stream = None
+        self.mixes_every_output = True
+        self.asset_watcher = None
+        self.retired_buffers = []
+        self.reloads = 0
+        self.source_end_samples = {}
+        self.voices = VoiceTracker()
+        self.playback_mismatches = 0
+        self.frame_sample = 0
+        self.source_gains = {}
+        self.prerendered_cues = {}
+        self.cached_voices = {}
+        self.pending_onsets = {}
+        self.source_offset = al.ALint(0)
+        self.source_position = (al.ALfloat * 3)()
+        self.voice_limit = None
+        self.priority_buffers = set()
+        self.sound_metrics = SoundMetrics()
+        # One block is rendered in place every frame instead of allocating ctypes and numpy buffers per call
+        self.render_buffer = (al.ALfloat * (render_size * nchannels))()
+        self.render_array = np.frombuffer(self.render_buffer, dtype=np.float32).reshape(render_size, nchannels)
+
+    def initialize(self, sample_rate: int = SOUND_SAMPLE_RATE, enable_audio_output: bool = False,
+                   output_fan_out: bool = ENABLE_OUTPUT_FAN_OUT) -> None:
+        self.sample_rate = sample_rate
+        self.set_virtual_renderer(SoundRenderer.create_virtual_renderer(sample_rate=sample_rate))
+        if enable_audio_output and output_fan_out:
+            # The device renderer holds no sources or buffers, it only plays the blocks mixed by the virtual one
+            self.output_stream = OutputStream(SoundRenderer.create_default_renderer(), self.render_size,
+                                              self.nchannels, sample_rate)
+        elif enable_audio_output:
+            self.set_default_renderer(SoundRenderer.create_default_renderer())
+        self.mixes_every_output = not enable_audio_output or output_fan_out
+        self.set_listener_position(*listener_position)
+        self.set_listener_orientation(*listener_orientation)
+
+    def load_sounds(self, data_path: Path, enable_prerendered_cues: bool = ENABLE_PRERENDERED_CUES) -> None:
+        self.load_sound_files(data_path)
+        self.sound_metrics.register_cues(self.sound_buffers)
+        self.update_priority_buffers()
+        if enable_prerendered_cues and not self.mixes_every_output:
+            logger.warning("Prerendered cues need ENABLE_OUTPUT_FAN_OUT with audio output, mixing them with OpenAL")
+        elif enable_prerendered_cues:
+            cues = prerender_cues(data_path, prerendered_cues, self.sample_rate, self.render_size, self.nchannels)
+            for (name, x, y, gain), cue in cues.items():
+                # Keyed the way play3d sees the cue, play(x, y) places sounds at (x, 0, y)
+                self.prerendered_cues[(self.get_sound_buffer(name), x, 0, y, gain)] = cue
+
+    def fill_audio_buffer(self, audio_buffer: AudioBuffer, alformat: int, pcm: bytes, sample_rate: int) -> None:
+        for sound_renderer, buffer_id in zip(self.sound_renderers, audio_buffer.get_buffers()):
+            sound_renderer.set()
+            al.alBufferData(buffer_id, alformat, pcm, len(pcm), sample_rate)
+
+    def load_sound_files(self, data_path: Path) -> None:
+        shared_buffers: Dict[bytes, SoundBuffer] = {}
+        for file in sorted(data_path.glob('*.wav')):
+            alformat, pcm, sample_rate = decode_wav(file)
+            key = content_key(alformat, pcm, sample_rate)
+            if key not in shared_buffers:
+                audio_buffer = self.create_audio_buffer()
+                self.fill_audio_buffer(audio_buffer, alformat, pcm, sample_rate)
+                duration, onset = measure_sound(alformat, pcm, sample_rate, self.sample_rate)
+                shared_buffers[key] = SoundBuffer(file.name, audio_buffer, sample_rate, duration, onset)
+            first = shared_buffers[key]
+            self.sound_buffers[file.name] = SoundBuffer(file.name, first.shared, first.sample_rate, first.duration,
+                                                        first.onset)
+        logger.info("{} sounds in {} buffers", len(self.sound_buffers), len(shared_buffers))
+
+    def update_priority_buffers(self) -> None:
+        self.priority_buffers = {self.sound_buffers[name] for name in priority_sound_names if name in self.sound_buffers}
+
+    def start_hot_reload(self, data_path: Path) -> None:
+        self.asset_watcher = AssetWatcher(data_path, self.sample_rate)
+        self.asset_watcher.start()
+
+    def apply_changed_sounds(self) -> None:
+        while not self.asset_watcher.changes.empty():
+            changed = self.asset_watcher.changes.get()
+            audio_buffer = self.create_audio_buffer()
+            self.fill_audio_buffer(audio_buffer, changed.format, changed.pcm, changed.sample_rate)
+            old_buffer = self.sound_buffers.get(changed.name)
+            self.sound_buffers[changed.name] = SoundBuffer(changed.name, audio_buffer, changed.sample_rate,
+                                                           changed.duration, changed.onset)
+            self.reloads += 1
+            logger.info("Reloaded {} on frame {}", changed.name, self.current_frame_number)
+            if changed.name in priority_sound_names:
+                self.update_priority_buffers()
+            if old_buffer is None:
+                continue
+            # Renders of the old sound are stale, aliases keep theirs as they have their own handles
+            stale = [key for key in self.prerendered_cues if key[0] is old_buffer]
+            for key in stale:
+                del self.prerendered_cues[key]
+            if stale:
+                self.rerender_cues(changed)
+            # Sources still playing the old buffer finish with it, it is deleted at the next round end
+            if all(sound_buffer.shared is not old_buffer.shared for sound_buffer in self.sound_buffers.values()):
+                self.retired_buffers.append(old_buffer.shared)
+
+    def rerender_cues(self, changed: ChangedSound) -> None:
+        # On the frame loop, the loopback device needs the process-wide current context. Reloads are a development aid
+        cues = [cue for cue in prerendered_cues if cue[0] == changed.name]
+        rendered = render_cues({changed.name: (changed.format, changed.pcm, changed.sample_rate)}, cues,
+                               self.sample_rate, self.render_size, self.nchannels)
+        for (name, x, y, gain), cue in rendered.items():
+            self.prerendered_cues[(self.sound_buffers[name], x, 0, y, gain)] = cue
+
+    def release_retired_buffers(self) -> None:
+        # Only call once every source is stopped, OpenAL refuses to delete a buffer a source still holds
+        if not self.retired_buffers:
+            return
+        for audio_source in self.audio_sources:
+            audio_source.clear_buffer()
+        for audio_buffer in self.retired_buffers:
+            for sound_renderer, buffer_id in zip(self.sound_renderers, audio_buffer.get_buffers()):
+                sound_renderer.delete_buffer(buffer_id)
+            self.audio_buffers.remove(audio_buffer)
+        logger.info("Released {} replaced sound buffers", len(self.retired_buffers))
+        self.retired_buffers = []
+
+    def is_playing(self, source: AudioSource) -> bool:
+        # Answered from the render clock, the driver is only asked in check_playback
+        if source in self.cached_voices:
+            return True
+        return self.rendered_samples < self.source_end_samples.get(source, 0)
+
+    def check_playback(self) -> None:
+        # Driver and render clock can disagree by a block around the end of a sound, beyond that the driver wins.
+        # Cached voices never reach the driver
+        ended = None
+        for source, end_sample in self.source_end_samples.items():
+            if source in self.cached_voices:
+                continue
+            playing = super().is_playing(source)
+            drift = self.rendered_samples - end_sample
+            if playing != (drift < 0) and abs(drift) > self.render_size:
+                self.playback_mismatches += 1
+                logger.warning("Source {} its duration by {} samples on frame {}",
+                               "outlasted" if playing else "stopped short of", abs(drift), self.current_frame_number)
+                end_sample = self.rendered_samples + self.render_size if playing else 0
+                self.source_end_samples[source] = end_sample
+                if playing:
+                    self.voices.start(source, end_sample)
+                else:
+                    self.voices.stop(source)
+            if not playing and end_sample <= self.rendered_samples:
+                ended = ended or []
+                ended.append(source)
+        if ended:
+            for source in ended:
+                del self.source_end_samples[source]
+
+    def count_voices(self, exclude: Optional[AudioSource] = None) -> int:
+        return self.voices.count(exclude)
+
+    def play3d(self, source: AudioSource, buffer: SoundBuffer, x: float, y: float, z: float, loop: bool) -> None:
+        if (self.voice_limit is not None and buffer not in self.priority_buffers
+                and self.count_voices(source) >= self.voice_limit):
+            self.sound_metrics.dropped_voices.inc()
+            return
+        self.sound_metrics.plays.inc()
+        self.sound_metrics.count_cue(buffer.name)
+        self.source_end_samples[source] = (LOOPING_END_SAMPLE if loop
+                                           else self.rendered_samples + buffer.duration)
+        self.voices.start(source, self.source_end_samples[source])
+        self.start_source(source, buffer, x, y, z, loop, self.frame_sample)
+
+    def start_source(self, source: AudioSource, buffer: SoundBuffer, x: float, y: float, z: float, loop: bool,
+                     trigger_sample: int) -> None:
+        self.pending_onsets[source] = (trigger_sample, buffer)
+        gain = self.source_gains.get(source, 1.0)
+        cue = self.prerendered_cues.get((buffer, x, y, z, gain))
+        if cue is None:
+            self.cached_voices.pop(source, None)
+            super().play3d(source, buffer, x, y, z, loop)
+        else:
+            super().stop(source)
+            self.cached_voices[source] = CachedVoice(cue, loop, gain)
+
+    def observe_onsets(self) -> None:
+        # Right after a block is rendered: a voice is audible once the mixer has played it past the point where the
+        # sound crosses the onset threshold. OpenAL reports how far it played a source, a cached voice how far it
+        # was mixed, so quantization and deferral by the renderer show up in the latency
+        reached = None
+        for source, (trigger_sample, buffer) in self.pending_onsets.items():
+            voice = self.cached_voices.get(source)
+            if voice is not None:
+                played, onset = voice.position, voice.cue.onset
+            else:
+                # The virtual renderer is always the first
+                al.alGetSourcei(source.get_source_ids()[0], al.AL_SAMPLE_OFFSET, self.source_offset)
+                played, onset = self.source_offset.value * self.sample_rate // buffer.sample_rate, buffer.onset
+            if played < onset and self.rendered_samples < self.source_end_samples.get(source, 0):
+                continue
+            reached = reached or []
+            reached.append(source)
+            if played < onset:
+                # Over before the renderer reported it past the onset, nothing was observed
+                continue
+            self.observe_cue_onset(self.rendered_samples - (played - onset) - trigger_sample)
+        if reached:
+            for source in reached:
+                del self.pending_onsets[source]
+
+    def observe_cue_onset(self, delay: int) -> None:
+        self.sound_metrics.observe_cue(delay, self.sample_rate, self.render_size)
+
+    def stop(self, source: AudioSource) -> None:
+        self.pending_onsets.pop(source, None)
+        if self.source_end_samples.pop(source, None) is None:
+            return
+        self.voices.stop(source)
+        self.sound_metrics.stops.inc()
+        if self.cached_voices.pop(source, None) is None:
+            super().stop(source)
+
+    def set_source_pos(self, source: AudioSource, x: float, y: float) -> None:
+        self.set_source_pos3d(source, x, 0, y)
+
+    def set_source_pos3d(self, source: AudioSource, x: float, y: float, z: float) -> None:
+        # Handlers move sources every few frames, the position goes through one array updated in place instead of a
+        # new list and ctypes array per call
+        position = self.source_position
+        position[0] = x
+        position[1] = y
+        position[2] = z
+        source_ids = source.get_source_ids()
+        for i in range(len(self.sound_renderers)):
+            alc.alcMakeContextCurrent(self.sound_renderers[i].context)
+            al.alSourcefv(source_ids[i], al.AL_POSITION, position)
+
+    def set_source_gain(self, source: AudioSource, gain: float) -> None:
+        self.source_gains[source] = gain
+        if source in self.cached_voices:
+            self.cached_voices[source].scale = gain / self.cached_voices[source].cue.gain
+        super().set_source_gain(source, gain)
+
+    def remove_source(self, source: AudioSource) -> None:
+        self.cached_voices.pop(source, None)
+        self.pending_onsets.pop(source, None)
+        self.source_end_samples.pop(source, None)
+        self.voices.stop(source)
+        self.source_gains.pop(source, None)
+        super().remove_source(source)
+
+    def begin_frame(self, frame_number: int) -> None:
+        # In lock-step with the game a frame's commands all take effect at the start of the next block rendered
+        self.current_frame_number = frame_number
+        self.frame_sample = self.rendered_samples
+        if frame_number % PLAYBACK_CHECK_INTERVAL == 0:
+            self.check_playback()
+        if self.asset_watcher and not self.asset_watcher.changes.empty():
+            self.apply_changed_sounds()
+
+    def render(self) -> np.ndarray:
+        # The returned (render_size, nchannels) view is overwritten by the next call
+        if not self.virtual_renderer:
+            raise ValueError("Virtual renderer not set")
+        self.virtual_renderer.set()
+        soft.alcRenderSamplesSOFT(self.virtual_renderer.device, self.render_buffer, self.render_size)
+        self.rendered_blocks += 1
+        self.rendered_samples += self.render_size
+        self.voices.advance(self.rendered_samples)
+        finished = None
+        for source, voice in self.cached_voices.items():
+            if not voice.mix_into(self.render_array):
+                finished = finished or []
+                finished.append(source)
+        if self.pending_onsets:
+            self.observe_onsets()
+        if finished:
+            for source in finished:
+                del self.cached_voices[source]
+        if self.output_stream:
+            self.output_stream.write(self.render_array)
+        return self.render_array
+
+    def close(self) -> None:
+        if self.asset_watcher:
+            self.asset_watcher.close()
+            self.asset_watcher = None
+        super().close()
+        if self.output_stream:
+            self.output_stream.close()
+            self.output_stream = None
+        self.asset_watcher = None
+        self.retired_buffers = []
@@ -0,0 +1,171 @@
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple
+
+import numpy as np
+from pyftg_sound.models.audio_source import AudioSource
+
+from src.config import SOUND_RENDER_SIZE
+from src.constants import source_attrs
+from src.sound_manager import SoundBuffer, SoundManager
+
+TRACE_MAGIC = b'SGTR'
+TRACE_VERSION = 3
+
+OP_CREATE_SOURCE = 0
+OP_REMOVE_SOURCE = 1
+OP_PLAY = 2
+OP_STOP = 3
+OP_SET_POS = 4
+OP_SET_GAIN = 5
+
+NO_BUFFER = 0xFFFF
+
+# magic, version, sample rate, render size, block count, buffer name count
+header_struct = struct.Struct('<4sHIHIH')
+# frame, block, op, source handle, buffer index, loop, x, y, z (gain is stored in x)
+record_struct = struct.Struct('<iIBIHBfff')
+name_length_struct = struct.Struct('<B')
+
+
+class TraceRecord(NamedTuple):
+    frame: int
+    block: int
+    op: int
+    source: int
+    buffer: int
+    loop: bool
+    x: float
+    y: float
+    z: float
+
+
+class SoundTrace(NamedTuple):
+    sample_rate: int
+    render_size: int
+    block_count: int
+    buffer_names: List[str]
+    records: List[TraceRecord]
+
+
+class SoundTraceRecorder(SoundManager):
+    trace: bytearray
+    block_origin: int
+    source_handles: Dict[AudioSource, int]
+    # Play records refer to the sound name the handler asked for, aliases of the same file stay apart
+    buffer_indices: Dict[str, int]
+    buffer_names: List[str]
+
+    def __init__(self, render_size: int = SOUND_RENDER_SIZE, nchannels: int = 2) -> None:
+        super().__init__(render_size, nchannels)
+        self.next_source_handle = 0
+        self.source_handles = {}
+        self.reset_trace()
+
+    def reset_trace(self) -> None:
+        self.trace = bytearray()
+        self.block_origin = self.rendered_blocks
+        self.buffer_indices = {}
+        self.buffer_names = []
+        # Sources outlive a single trace, so a new trace starts by re-declaring the ones still alive
+        for source, handle in self.source_handles.items():
+            self.record(OP_CREATE_SOURCE, handle)
+            if source in self.source_gains:
+                self.record(OP_SET_GAIN, handle, x=self.source_gains[source])
+
+    def record(self, op: int, source: int, buffer: int = NO_BUFFER, loop: bool = False,
+               x: float = 0, y: float = 0, z: float = 0) -> None:
+        self.trace += record_struct.pack(self.current_frame_number, self.rendered_blocks - self.block_origin,
+                                         op, source, buffer, loop, x, y, z)
+
+    def get_buffer_index(self, buffer: SoundBuffer) -> int:
+        if buffer is None:
+            return NO_BUFFER
+        if buffer.name not in self.buffer_indices:
+            self.buffer_indices[buffer.name] = len(self.buffer_names)
+            self.buffer_names.append(buffer.name)
+        return self.buffer_indices[buffer.name]
+
+    def create_audio_source(self, attrs: dict = {}) -> AudioSource:
+        source = super().create_audio_source(attrs)
+        self.source_handles[source] = self.next_source_handle
+        self.next_source_handle += 1
+        self.record(OP_CREATE_SOURCE, self.source_handles[source])
+        return source
+
+    def remove_source(self, source: AudioSource) -> None:
+        self.record(OP_REMOVE_SOURCE, self.source_handles.pop(source))
+        super().remove_source(source)
+
+    def play3d(self, source: AudioSource, buffer: SoundBuffer, x: float, y: float, z: float, loop: bool) -> None:
+        self.record(OP_PLAY, self.source_handles[source], self.get_buffer_index(buffer), loop, x, y, z)
+        super().play3d(source, buffer, x, y, z, loop)
+
+    def stop(self, source: AudioSource) -> None:
+        self.record(OP_STOP, self.source_handles[source])
+        super().stop(source)
+
+    def set_source_pos3d(self, source: AudioSource, x: float, y: float, z: float) -> None:
+        self.record(OP_SET_POS, self.source_handles[source], x=x, y=y, z=z)
+        super().set_source_pos3d(source, x, y, z)
+
+    def set_source_gain(self, source: AudioSource, gain: float) -> None:
+        self.record(OP_SET_GAIN, self.source_handles[source], x=gain)
+        super().set_source_gain(source, gain)
+
+    def save_trace(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(header_struct.pack(TRACE_MAGIC, TRACE_VERSION, self.sample_rate, self.render_size,
+                                       self.rendered_blocks - self.block_origin, len(self.buffer_names)))
+            for name in self.buffer_names:
+                encoded_name = name.encode('utf-8')
+                f.write(name_length_struct.pack(len(encoded_name)))
+                f.write(encoded_name)
+            f.write(self.trace)
+
+
+def load_trace(path: Path) -> SoundTrace:
+    data = path.read_bytes()
+    magic, version, sample_rate, render_size, block_count, name_count = header_struct.unpack_from(data)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise ValueError(f"Unsupported sound trace: {path}")
+    offset = header_struct.size
+    buffer_names = []
+    for _ in range(name_count):
+        (length,) = name_length_struct.unpack_from(data, offset)
+        offset += name_length_struct.size
+        buffer_names.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+    records = [TraceRecord(*fields) for fields in record_struct.iter_unpack(data[offset:])]
+    return SoundTrace(sample_rate, render_size, block_count, buffer_names, records)
+
+
+def apply_record(sound_manager: SoundManager, record: TraceRecord, sources: Dict[int, AudioSource],
+                 buffers: List[SoundBuffer]) -> None:
+    if record.op == OP_CREATE_SOURCE:
+        sources[record.source] = sound_manager.create_audio_source(source_attrs)
+    elif record.op == OP_REMOVE_SOURCE:
+        sound_manager.remove_source(sources.pop(record.source))
+    elif record.op == OP_PLAY:
+        sound_manager.play3d(sources[record.source], buffers[record.buffer], record.x, record.y, record.z,
+                             bool(record.loop))
+    elif record.op == OP_STOP:
+        sound_manager.stop(sources[record.source])
+    elif record.op == OP_SET_POS:
+        sound_manager.set_source_pos3d(sources[record.source], record.x, record.y, record.z)
+    elif record.op == OP_SET_GAIN:
+        sound_manager.set_source_gain(sources[record.source], record.x)
+
+
+def replay_trace(trace: SoundTrace, sound_manager: SoundManager) -> Iterator[np.ndarray]:
+    # Re-issues every command at the block it was recorded in and yields each rendered block
+    buffers = [sound_manager.get_sound_buffer(name) for name in trace.buffer_names]
+    sources: Dict[int, AudioSource] = {}
+    index = 0
+    for block in range(trace.block_count):
+        sound_manager.frame_sample = sound_manager.rendered_samples
+        while index < len(trace.records) and trace.records[index].block <= block:
+            apply_record(sound_manager, trace.records[index], sources, buffers)
+            index += 1
+        yield sound_manager.render()
@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Tuple
+
+from src.config import FRAME_TRACE_CAPACITY
+
+# name, category, start and duration in nanoseconds, frame number, thread id
+Span = Tuple[str, str, int, int, int, int]
+
+
+class FrameTracer:
+    # Records spans as Chrome trace events, viewable in Perfetto or chrome://tracing
+    spans: Deque[Span]
+    frame_number: int
+
+    def __init__(self, capacity: int = FRAME_TRACE_CAPACITY) -> None:
+        # Oldest spans are dropped once full, so a long session keeps its most recent frames
+        self.spans = deque(maxlen=capacity)
+        self.frame_number = -1
+
+    def wrap(self, function: Callable, name: str, category: str) -> Callable:
+        spans = self.spans
+
+        def traced(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                spans.append((name, category, start, time.perf_counter_ns() - start, self.frame_number,
+                              threading.get_native_id()))
+        return traced
+
+    def instrument(self, target: object, names: Iterable[str], category: str) -> None:
+        # Shadows the bound methods on this one instance, nothing is wrapped while tracing is off
+        for name in names:
+            setattr(target, name, self.wrap(getattr(target, name), name, category))
+
+    def save(self, path: Path) -> None:
+        pid = os.getpid()
+        events = [{"name": name, "cat": category, "ph": "X", "ts": start / 1000, "dur": duration / 1000,
+                   "pid": pid, "tid": tid, "args": {"frame": frame}}
+                  for name, category, start, duration, frame, tid in self.spans]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        self.spans.clear()
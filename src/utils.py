@@ -1,4 +1,8 @@
+import gc
+import os
+import time
 from pathlib import Path
+from typing import Optional
 
 from loguru import logger
 from pyftg.models.attack_data import AttackData
@@ -8,6 +12,9 @@ from pyftg.models.enums.state import State
 
 from src.config import ENABLE_LOGGING
 
+# Generation-2 threshold used while a round is running, high enough that full collections only happen on demand
+DEFERRED_GEN2_THRESHOLD = 1_000_000
+
 
 def setup_logging():
     if ENABLE_LOGGING:
@@ -17,6 +24,35 @@ def setup_logging():
         logger.disable("")
 
 
+def freeze_gc():
+    gc.collect()
+    gc.freeze()
+    threshold0, threshold1, _ = gc.get_threshold()
+    gc.set_threshold(threshold0, threshold1, DEFERRED_GEN2_THRESHOLD)
+
+
+def collect_gc():
+    # Objects created since start-up stay collectable, freezing them again would only grow the permanent generation
+    gc.collect()
+
+
+def process_uptime() -> Optional[float]:
+    # Seconds since the process was started or forked, interpreter start-up included. Linux only
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22, counted after the parenthesised command name which may contain spaces
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def log_startup(stage: str) -> None:
+    uptime = process_uptime()
+    if uptime is not None:
+        logger.info("{} {:.0f} ms after process start", stage, uptime * 1000)
+
+
 def detection_hit(opponent: CharacterData, attack: AttackData) ->bool:
     if not attack or opponent.state is State.DOWN:
         return False
@@ -0,0 +1,98 @@
+import os
+import signal
+import sys
+import time
+from typing import Callable, NamedTuple, Optional
+
+# Everything a game needs is imported before the first fork, so workers start with it loaded
+import pyftg.socket.aio.gateway  # noqa: F401
+from loguru import logger
+
+import src.metrics_server  # noqa: F401
+from src.config import DAEMON_RETRY_INTERVAL, ENABLE_GC_FREEZE
+from src.core import SampleSoundGenAI
+from src.utils import freeze_gc, log_startup
+
+# Exit code of a worker that never got a frame, usually because the game was not up yet
+EXIT_NO_GAME = 3
+
+PlayGame = Callable[[SampleSoundGenAI], None]
+
+
+class WarmWorker(NamedTuple):
+    pid: int
+    # Write end of the pipe the worker waits on before it connects
+    go: int
+
+
+def serve_game(go: int, play_game: PlayGame) -> int:
+    # OpenAL is only set up after the fork, a device or context must not be shared between processes
+    sound_genai = SampleSoundGenAI()
+    log_startup(f"Worker {os.getpid()} ready for frames")
+    try:
+        # Blocks until the game before this one is over, nothing to read means the daemon is gone
+        if not os.read(go, 1):
+            return 0
+        play_game(sound_genai)
+        return 0 if sound_genai.frames_processed.value else EXIT_NO_GAME
+    finally:
+        sound_genai.close()
+
+
+def fork_worker(play_game: PlayGame) -> WarmWorker:
+    go_read, go_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(go_write)
+        code = 1
+        try:
+            code = serve_game(go_read, play_game)
+        except (SystemExit, KeyboardInterrupt):
+            # The daemon is shutting down, serve_game has already closed the sound AI
+            pass
+        except Exception:
+            logger.exception("Worker {} failed", os.getpid())
+        finally:
+            # Skips the daemon's exit handlers and buffers inherited through the fork
+            os._exit(code)
+    os.close(go_read)
+    return WarmWorker(pid, go_write)
+
+
+def stop_daemon(signum: int, frame) -> None:
+    sys.exit(0)
+
+
+def run_daemon(play_game: PlayGame) -> None:
+    # One worker plays the current game while the next one is already set up and waiting for it to end
+    if not hasattr(os, 'fork'):
+        logger.error("Daemon mode needs os.fork, which this platform does not have")
+        return
+    signal.signal(signal.SIGTERM, stop_daemon)
+    if ENABLE_GC_FREEZE:
+        # Once, before the first fork. Frozen objects are left alone by the collector, so their pages stay shared
+        # with every worker
+        freeze_gc()
+    log_startup("Daemon warm")
+    ready = fork_worker(play_game)
+    playing: Optional[WarmWorker] = None
+    try:
+        while True:
+            playing = ready
+            os.write(playing.go, b'\x01')
+            os.close(playing.go)
+            ready = fork_worker(play_game)
+            _, status = os.waitpid(playing.pid, 0)
+            playing = None
+            code = os.waitstatus_to_exitcode(status)
+            if code == EXIT_NO_GAME:
+                logger.info("No game was played, next worker connects in {:.0f} s", DAEMON_RETRY_INTERVAL)
+                time.sleep(DAEMON_RETRY_INTERVAL)
+            elif code != 0:
+                logger.warning("Worker exited with code {}", code)
+    finally:
+        os.close(ready.go)
+        if playing is not None:
+            os.kill(playing.pid, signal.SIGTERM)
+            os.waitpid(playing.pid, 0)
+        os.waitpid(ready.pid, 0)